@@ -7,23 +7,49 @@ v4:  Added coordinator task and fixed blocking calls issue (by adding add_execut
 v5:  Working version locked to start improvements
 v6:  Various imporvements to robustness and fully async
 v7:  Wrapped port open/close around read/writes to improve connectivty reliability
-TODO: Sort out the thermo avaiablity (hub down event breaks it)
+v8:  Persistent self-healing connection owned by UH1 (reconnect with backoff, TCP_NODELAY/keepalive)
+v9:  Several UH1 hubs side by side - ids are per hub so thermo 1 on two buses no longer clash
+v10: Hub level services - bulk schedules and drift-aware clock sync
 """
 from __future__ import annotations
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.const import Platform, CONF_HOST, CONF_PORT
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.const import Platform, CONF_HOST, CONF_PORT, ATTR_ENTITY_ID
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 from collections.abc import Callable
 from dataclasses import dataclass
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    SERVICE_SET_SCHEDULES,
+    SET_SCHEDULES_SCHEMA,
+    SERVICE_SYNC_CLOCKS,
+    SYNC_CLOCKS_SCHEMA,
+    SERVICE_RESCAN,
+    RESCAN_SCHEMA,
+    STORAGE_SAVE_INTERVAL,
+    ATTR_THRESHOLD,
+    ATTR_HEAT_WEEKDAY,
+    ATTR_HEAT_WEEKEND,
+    ATTR_DHW_WEEKDAY,
+    ATTR_DHW_WEEKEND,
+    ATTR_TIME,
+    ATTR_TEMP,
+    ATTR_ON,
+    ATTR_OFF,
+)
 from .coordinator import HMCoordinator
+from .heatmiserRS import heat_schedule, dhw_schedule, CLOCK_DRIFT_THRESHOLD
+
+from datetime import timedelta
+import asyncio
 
 import logging
 _LOGGER = logging.getLogger(__name__)
-PLATFORMS = [Platform.CLIMATE]
+PLATFORMS = [Platform.CLIMATE, Platform.SENSOR, Platform.BINARY_SENSOR]
 
 # List of platforms to support. There should be a matching .py file for each,
 # eg <cover.py> and <sensor.py>
@@ -52,13 +78,19 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # If the refresh fails, async_config_entry_first_refresh will
     # raise ConfigEntryNotReady and setup will try again later
     # If you do not want to retry setup on failure, use
-    # coordinator.async_refresh() instead
+    # coordinator.async_refresh() instead. An unreachable UH1 fails the refresh (see
+    # HMCoordinator.async_update_data) so no separate connected check is needed
     await coordinator.async_config_entry_first_refresh()
 
-    # Test to see if api initialised correctly, else raise ConfigNotReady to make HA retry setup
-    # TODO: Add a connected property to my UH1 class
-    #if not coordinator.uh1_con.connected:
-    #    raise ConfigEntryNotReady
+    # Each hub is a device of its own that its thermos hang off
+    await _async_migrate_ids(hass, entry)
+    dr.async_get(hass).async_get_or_create(
+        config_entry_id=entry.entry_id,
+        identifiers={(DOMAIN, coordinator.hub_id)},
+        name="UH1 {}".format(entry.data[CONF_HOST]),
+        model="UH1",
+        manufacturer=coordinator.uh1.manufacturer,
+    )
 
     # Initialise a listener for config flow options changes.
     # See config_flow for defining an options setting that shows up as configure on the integration.
@@ -70,8 +102,112 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # This creates each HA object for each platform your device requires.
     # It's done by calling the `async_setup_entry` function in each platform module.
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    _async_register_services(hass)
+    # Saved on a fixed interval (and at shutdown) so a crash or power cut loses at most one interval
+    entry.async_on_unload(async_track_time_interval(
+        hass, coordinator.async_save, timedelta(seconds=STORAGE_SAVE_INTERVAL)))
+    if coordinator.clock_sync_hours:
+        # Drift is worked out from the cached clocks so a sync that finds nothing to do costs no bus time
+        entry.async_on_unload(async_track_time_interval(
+            hass, coordinator.async_sync_clocks, timedelta(hours=coordinator.clock_sync_hours)))
     return True
 
+def _target_thermos(hass: HomeAssistant, entity_ids=None) -> list:
+    """(climate entity id, coordinator, thermo) for the targeted entities, every thermo on every hub without targets"""
+    registry = er.async_get(hass)
+    targets = []
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        if entry.state is not ConfigEntryState.LOADED:
+            continue
+        coordinator = entry.runtime_data.coordinator
+        for thermo in coordinator.uh1.thermos:
+            entity_id = registry.async_get_entity_id(Platform.CLIMATE, DOMAIN, "hmrsthermo_" + coordinator.thermo_key(thermo))
+            if entity_id is not None and (entity_ids is None or entity_id in entity_ids):
+                targets.append((entity_id, coordinator, thermo))
+    return targets
+
+@callback
+def _async_register_services(hass: HomeAssistant) -> None:
+    """Hub level services, shared by every config entry so only registered once"""
+    if hass.services.has_service(DOMAIN, SERVICE_SET_SCHEDULES):
+        return
+
+    async def _async_set_schedules(call: ServiceCall) -> ServiceResponse:
+        """Program many thermos in one go, skipping blocks a thermo already holds"""
+        schedules = {}
+        for block in (ATTR_HEAT_WEEKDAY, ATTR_HEAT_WEEKEND):
+            if block in call.data:
+                schedules[block] = heat_schedule([(p[ATTR_TIME].hour, p[ATTR_TIME].minute, p[ATTR_TEMP]) for p in call.data[block]])
+        for block in (ATTR_DHW_WEEKDAY, ATTR_DHW_WEEKEND):
+            if block in call.data:
+                schedules[block] = dhw_schedule([(p[ATTR_ON].hour, p[ATTR_ON].minute, p[ATTR_OFF].hour, p[ATTR_OFF].minute)
+                                                 for p in call.data[block]])
+        plans = {}      # coordinator -> {thermo: schedules}, each hub's writes go out as one bus session
+        entity_ids = {}
+        for entity_id, coordinator, thermo in _target_thermos(hass, call.data.get(ATTR_ENTITY_ID)):
+            plans.setdefault(coordinator, {})[thermo] = schedules
+            entity_ids[coordinator, thermo._id] = entity_id
+        _LOGGER.info("[RS] set_schedules {} on {}".format(list(schedules), list(entity_ids.values())))
+        results = await asyncio.gather(*(c.uh1.async_set_schedules(plan) for c, plan in plans.items()))
+        response = {}
+        for coordinator, hub_results in zip(plans, results):
+            coordinator.async_boost()
+            for tstat_id, result in hub_results.items():
+                response[entity_ids[coordinator, tstat_id]] = result
+        return response
+
+    async def _async_sync_clocks(call: ServiceCall) -> ServiceResponse:
+        """Set HA's time on the thermos whose clocks have drifted past the threshold"""
+        threshold = call.data.get(ATTR_THRESHOLD, CLOCK_DRIFT_THRESHOLD)
+        targets = {}      # coordinator -> [thermo]
+        entity_ids = {}
+        for entity_id, coordinator, thermo in _target_thermos(hass, call.data.get(ATTR_ENTITY_ID)):
+            targets.setdefault(coordinator, []).append(thermo)
+            entity_ids[coordinator, thermo._id] = entity_id
+        results = await asyncio.gather(*(c.async_sync_clocks(thermos=thermos, threshold=threshold)
+                                         for c, thermos in targets.items()))
+        response = {}
+        for coordinator, hub_results in zip(targets, results):
+            for tstat_id, result in hub_results.items():
+                response[entity_ids[coordinator, tstat_id]] = result
+        return response
+
+    async def _async_rescan(call: ServiceCall) -> ServiceResponse:
+        """Look for thermos added to any hub's bus since it was set up, keyed by hub"""
+        entries = [e for e in hass.config_entries.async_entries(DOMAIN) if e.state is ConfigEntryState.LOADED]
+        results = await asyncio.gather(*(e.runtime_data.coordinator.async_rescan() for e in entries))
+        return {entry.title: {"thermos": topology} for entry, topology in zip(entries, results)}
+
+    hass.services.async_register(DOMAIN, SERVICE_SET_SCHEDULES, _async_set_schedules,
+                                 schema=SET_SCHEDULES_SCHEMA, supports_response=SupportsResponse.OPTIONAL)
+    hass.services.async_register(DOMAIN, SERVICE_SYNC_CLOCKS, _async_sync_clocks,
+                                 schema=SYNC_CLOCKS_SCHEMA, supports_response=SupportsResponse.OPTIONAL)
+    hass.services.async_register(DOMAIN, SERVICE_RESCAN, _async_rescan,
+                                 schema=RESCAN_SCHEMA, supports_response=SupportsResponse.OPTIONAL)
+
+async def _async_migrate_ids(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Thermo unique ids and devices used to be keyed on the bus address alone, now they are per hub"""
+    prefix = "hmrsthermo_"
+
+    @callback
+    def _migrate_entity(entity_entry: er.RegistryEntry):
+        tstat_id = entity_entry.unique_id[len(prefix):]
+        if entity_entry.unique_id.startswith(prefix) and tstat_id.isdigit():
+            return {"new_unique_id": "{}{}_{}".format(prefix, entry.entry_id, tstat_id)}
+        return None
+
+    await er.async_migrate_entries(hass, entry.entry_id, _migrate_entity)
+
+    dev_reg = dr.async_get(hass)
+    for device in dr.async_entries_for_config_entry(dev_reg, entry.entry_id):
+        identifiers = {
+            (domain, "{}_{}".format(entry.entry_id, ident)) if domain == DOMAIN and str(ident).isdigit() else (domain, ident)
+            for domain, ident in device.identifiers
+        }
+        if identifiers != device.identifiers:
+            _LOGGER.info("[RS] Migrating device {} to identifiers {}".format(device.name, identifiers))
+            dev_reg.async_update_device(device.id, new_identifiers=identifiers)
+
 async def _async_update_listener(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
     """Update listener."""
     await hass.config_entries.async_reload(config_entry.entry_id)
@@ -90,5 +226,9 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     _LOGGER.debug("[RS] async_unload_entry called with entry.data: {}".format(entry.data))
     
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        coordinator = entry.runtime_data.coordinator
+        coordinator.hubs.remove(coordinator.uh1)
+        await coordinator.uh1.async_close()
 
     return unload_ok
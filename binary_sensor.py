@@ -0,0 +1,90 @@
+"""
+Binary sensor platform for heatmiser_rs
+
+Heat demand and (PRTHW only) hot water state for each thermo, read from the DCB snapshot
+the coordinator already polls so they cost no extra RS-485 traffic
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+    BinarySensorEntityDescription,
+)
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .heatmiserRS import Thermostat, PRTHW
+from .const import DOMAIN
+from .coordinator import HMCoordinator
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, kw_only=True)
+class HMBinarySensorDescription(BinarySensorEntityDescription):
+    """Thermo binary sensor whose state comes from the cached DCB snapshot"""
+    is_on_fn: Callable[[Thermostat], bool]
+    exists_fn: Callable[[Thermostat], bool] = lambda t: True
+
+
+BINARY_SENSORS = (
+    HMBinarySensorDescription(
+        key="heat_demand",
+        name="Heat demand",
+        device_class=BinarySensorDeviceClass.HEAT,
+        is_on_fn=lambda t: t.get_heat_status(),
+    ),
+    HMBinarySensorDescription(
+        key="hot_water",
+        name="Hot water",
+        device_class=BinarySensorDeviceClass.RUNNING,
+        is_on_fn=lambda t: t.get_hotwater_status(),
+        exists_fn=lambda t: t.model == PRTHW,
+    ),
+)
+
+
+async def async_setup_entry(hass, config_entry, async_add_entities) -> None:
+    """Add the binary sensors each thermo supports"""
+    _LOGGER.debug("[RS] binary_sensor.py async_setup_entry called with config_entry: {}".format(config_entry))
+    coordinator: HMCoordinator = config_entry.runtime_data.coordinator
+    async_add_entities(
+        HMBinarySensor(coordinator, t, d)
+        for t in coordinator.uh1.thermos
+        for d in BINARY_SENSORS
+        if d.exists_fn(t)
+    )
+
+
+class HMBinarySensor(CoordinatorEntity, BinarySensorEntity):
+    """One on/off state from a thermo's snapshot, unavailable while the thermo's health check has it offline"""
+    entity_description: HMBinarySensorDescription
+
+    def __init__(self, coordinator, thermo: Thermostat, description: HMBinarySensorDescription):
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._thermo = thermo
+        self._attr_unique_id = "hmrsthermo_{}_{}".format(coordinator.thermo_key(thermo), description.key)
+        self._attr_name = "{} {}".format(thermo.name, description.name)
+        self._attr_device_info = {"identifiers": {(DOMAIN, coordinator.thermo_key(thermo))}}
+        self._attr_is_on = bool(description.is_on_fn(thermo))
+        self._last_available = self.available
+
+    @property
+    def available(self) -> bool:
+        return super().available and self._thermo.health.available
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Only write state when it or availability has moved"""
+        is_on = bool(self.entity_description.is_on_fn(self._thermo))
+        available = self.available
+        if is_on == self._attr_is_on and available == self._last_available:
+            return
+        self._attr_is_on = is_on
+        self._last_available = available
+        self.async_write_ha_state()
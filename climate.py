@@ -25,7 +25,6 @@ import logging
 import asyncio
 _LOGGER = logging.getLogger(__name__)
 DEFAULT_TEMP = 16
-CONN_RETRIES = 3
 
 # Each thermostat climate are added at
 # the same time to the same list. This way only a single async_add_devices call is
@@ -80,9 +79,8 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         self._thermo: Thermostat = thermo
         self._name = self._thermo.name
         self._id = self._thermo._id
-        self._count_retries = 0
-        
-        self._attr_unique_id = "hmrsthermo_" + str(self._id)
+
+        self._attr_unique_id = "hmrsthermo_" + coordinator.thermo_key(thermo)
         self._attr_name = self._thermo.name
 
         self._attr_min_temp = MIN_TEMP
@@ -101,22 +99,63 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         self._attr_fan_modes = [FAN_OFF, FAN_ON]
         self._attr_preset_modes = [PRESET_HOME, PRESET_AWAY]
 
-        self._attr_hvac_mode = HVACMode.HEAT if self._thermo.get_heat_status() else HVACMode.OFF
-        self._attr_preset_mode = PRESET_AWAY if self._thermo.get_holiday() else PRESET_HOME
-        self._attr_fan_mode = FAN_ON if self._thermo.get_hotwater_status() else FAN_OFF
-        self._attr_current_temperature = self._thermo.get_room_temp()
-        self._attr_target_temperature = self._thermo.get_target_temp()
+        self._attr_hvac_mode = self._attr_preset_mode = self._attr_fan_mode = None
+        self._attr_current_temperature = self._attr_target_temperature = None
+        self._attr_extra_state_attributes = {"stale": None}
+        self._last_snapshot = None
+        self._last_online = None
+        self._last_available = None
+        self._refresh_attrs()
+
+    def _refresh_attrs(self) -> bool:
+        """Copy the thermo's snapshot into the _attr_ fields, True if anything we expose changed"""
+        snapshot = self._thermo.snapshot
+        online = self._thermo.online
+        available = self.available      # Goes with the coordinator when the hub cannot be reached
+        if snapshot is self._last_snapshot and online == self._last_online and available == self._last_available:
+            return False    # Poll brought nothing new for this thermo
+        self._last_snapshot = snapshot
+
+        room_temp = self._thermo.get_room_temp()
+        # Room temp wanders by a tenth either way all day - only report moves bigger than the deadband
+        if (room_temp is not None and self._attr_current_temperature is not None
+                and round(abs(room_temp - self._attr_current_temperature), 2) < self.coordinator.temp_deadband):
+            room_temp = self._attr_current_temperature
+        exposed = (
+            HVACMode.HEAT if self._thermo.get_heat_status() else HVACMode.OFF,
+            PRESET_AWAY if self._thermo.get_holiday() else PRESET_HOME,
+            FAN_ON if self._thermo.get_hotwater_status() else FAN_OFF,
+            room_temp,
+            self._thermo.get_target_temp(),
+        )
+        # Compare against what the entity shows now, which service calls may have set optimistically
+        current = (self._attr_hvac_mode, self._attr_preset_mode, self._attr_fan_mode,
+                   self._attr_current_temperature, self._attr_target_temperature)
+        # Stale while still showing the snapshot saved before a restart. The heating figures come from
+        # the thermo's poll history, rounded (C per hour, duty cycle in %) so they only move now and then
+        stats = self._thermo.history.stats()
+        attrs = {
+            "stale": self._thermo.stale,
+            "heating_rate": None if stats["heating_rate"] is None else round(stats["heating_rate"], 1),
+            "cooling_rate": None if stats["cooling_rate"] is None else round(stats["cooling_rate"], 1),
+            "duty_cycle": None if stats["duty_cycle"] is None else round(stats["duty_cycle"] * 100),
+        }
+        if (exposed == current and online == self._last_online and available == self._last_available
+                and attrs == self._attr_extra_state_attributes):
+            return False
+        self._last_online = online
+        self._last_available = available
+        (self._attr_hvac_mode, self._attr_preset_mode, self._attr_fan_mode,
+         self._attr_current_temperature, self._attr_target_temperature) = exposed
+        self._attr_extra_state_attributes = attrs
+        return True
 
     @callback
     def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        _LOGGER.debug("[RS] _handle_coordinator_update updating _attr_ feilds for thermo {}".format(self._id))
-        self._attr_hvac_mode = HVACMode.HEAT if self._thermo.get_heat_status() else HVACMode.OFF
-        self._attr_preset_mode = PRESET_AWAY if self._thermo.get_holiday() else PRESET_HOME
-        self._attr_fan_mode = FAN_ON if self._thermo.get_hotwater_status() else FAN_OFF
-        self._attr_current_temperature = self._thermo.get_room_temp()
-        self._attr_target_temperature = self._thermo.get_target_temp()
-        self.async_write_ha_state()
+        """Handle updated data from the coordinator, only writing state when something changed"""
+        if self._refresh_attrs():
+            _LOGGER.debug("[RS] _handle_coordinator_update thermo {} changed, writing state".format(self._id))
+            self.async_write_ha_state()
 
     @property
     def hvac_mode(self) -> str:
@@ -156,6 +195,7 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         result =  await self._thermo.async_set_target_temp(int(temperature))
         self._attr_hvac_mode = HVACMode.HEAT if self._thermo.get_heat_status() else HVACMode.OFF
         self.async_write_ha_state()
+        self.coordinator.async_boost()
         return result
 
     async def async_set_preset_mode(self, preset_mode: str):
@@ -168,6 +208,7 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         else:
             result = await self._thermo.async_set_holiday(HOLIDAY_HOURS_MAX)
         self.async_write_ha_state()
+        self.coordinator.async_boost()
         return result
 
     async def async_set_hvac_mode(self, **kwargs):
@@ -183,6 +224,7 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         else:
             result = await self._thermo.async_set_hotwater(HW_F_ON)
         self.async_write_ha_state()
+        self.coordinator.async_boost()
         return result
 
     @property
@@ -190,7 +232,8 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         """Information about this entity/device."""
         _LOGGER.debug("[RS] device info called")
         return {
-            "identifiers": {(DOMAIN, self._thermo._id)},
+            "identifiers": {(DOMAIN, self.coordinator.thermo_key(self._thermo))},
+            "via_device": (DOMAIN, self.coordinator.hub_id),
             # If desired, the name for the device could be different to the entity
             "name": self._thermo.name,
             "sw_version": self._thermo.fw_version,
@@ -207,16 +250,8 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
     # If an entity is offline (return False), the UI will refelect this.
     @property
     def available(self) -> bool:
-        """Return False if thermo is not available for thre retries """
-        if self._thermo.online:
-            self._count_retries = 0
-        else:
-            self._count_retries +=1
-            if self._count_retries >= 3:
-                _LOGGER.debug("HMThermostat {} failed 3 attemps so offline".format(self._thermo._id))
-                return False 
-        _LOGGER.debug("HMThermostat avaiable: Thermo online = {}, count = {} ".format(self._thermo.online, self._count_retries))
-        return True
+        """Return False once the thermo's health check has it offline (see ThermoHealth), a missed poll or two is fine"""
+        return super().available and self._thermo.health.available
 
     async def async_set_daytime(self, day, set_time):
         """Handle Set Daytime service call"""
@@ -227,7 +262,9 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         secs =set_time.second
         _LOGGER.info("[RS] Set daytime sched with day={} hour={} mins={} secs={}".format(day, hour, mins, secs))
         day_num = days[day]
-        return await self._thermo.async_set_daytime(day_num, hour, mins, secs)
+        result = await self._thermo.async_set_daytime(day_num, hour, mins, secs)
+        self.coordinator.async_boost()
+        return result
        
     async def async_set_heat_schedule(self, day, time1, temp1, time2=None, temp2=15, time3=None, temp3=15, time4=None, temp4=15):
         """Handle Set heat schedule service call  NOTE: Can only program in 30 minute intrevals """
@@ -255,7 +292,9 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         else:
             weekend = False
         _LOGGER.info("[RS] Set heat sched with Weekend={}, {}".format(weekend, sched))
-        return await self._thermo.async_set_heat_schedule(weekend, sched)
+        result = await self._thermo.async_set_heat_schedule(weekend, sched)
+        self.coordinator.async_boost()
+        return result
 
     async def async_set_dhw_schedule(self, day, time1, dur_hrs1, time2, dur_hrs2):
         """Handle Set DHW service call (hard coded arrays at moment)"""
@@ -273,4 +312,6 @@ class HMThermostat(CoordinatorEntity, ClimateEntity):
         else:
             weekend = False
         _LOGGER.info("[RS] Setting DHW schedule with Weekend={}, {}".format(weekend, sched))
-        return await self._thermo.async_set_dhw_schedule(weekend, sched)   
\ No newline at end of file
+        result = await self._thermo.async_set_dhw_schedule(weekend, sched)
+        self.coordinator.async_boost()
+        return result
@@ -7,10 +7,22 @@ from typing import Any
 import voluptuous as vol
 
 from homeassistant import config_entries, exceptions
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.const import CONF_HOST, CONF_PORT
 
 from .const import DOMAIN  # pylint:disable=unused-import
+from .const import (
+    CONF_FAST_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_BUS_BUDGET,
+    CONF_TEMP_DEADBAND,
+    CONF_CLOCK_SYNC_HOURS,
+    DEFAULT_FAST_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_BUS_BUDGET,
+    DEFAULT_TEMP_DEADBAND,
+    DEFAULT_CLOCK_SYNC_HOURS,
+)
 from .heatmiserRS import UH1
 
 _LOGGER = logging.getLogger(__name__)
@@ -53,6 +65,7 @@ async def validate_input(hass: HomeAssistant, data: dict) -> dict[str, Any]:
     # The dummy hub provides a `test_connection` method to ensure it's working
     # as expected
     result = await uh1.async_open_connection()
+    await uh1.async_close()
     if not result:
         # If there is an error connecting, raise an exception to notify HA that there was a
         # problem. The UI will also show there was a problem
@@ -72,6 +85,13 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_POLL
 
     _LOGGER.debug("[RS] config flow ConfigFlow class setup with DOMAIN {}".format(DOMAIN))
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Options (configure) for the polling behaviour."""
+        return OptionsFlowHandler()
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         # This goes through the steps to take the user through the setup process.
@@ -96,6 +116,9 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors["base"] = "unknown"
 
             if "base" not in errors:
+                # One entry per bridge - two bus loops on the same RS-485 segment would talk over each other
+                await self.async_set_unique_id("{}:{}".format(user_input[CONF_HOST], user_input[CONF_PORT]).lower())
+                self._abort_if_unique_id_configured()
                 # Validation was successful, so create the config entry
                 _LOGGER.debug("[RS] setting up entry with title, data: {}, {}".format("Heatmiser RS",user_input))
                 return self.async_create_entry(title=info["title"], data=user_input)
@@ -104,6 +127,36 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         _LOGGER.debug("[RS] If there is no user input or there were errors, show the form again, including any errors")
         return self.async_show_form(step_id="user", data_schema=CONN_SCHEMA, errors=errors)
 
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the polling and reporting options."""
+
+    async def async_step_init(self, user_input=None):
+        """Single form with the fast/slowest poll intervals, the bus budget, the temperature deadband and clock sync"""
+        _LOGGER.debug("[RS] options flow async_step_init called with user input: {}".format(user_input))
+        errors = {}
+        if user_input is not None:
+            if user_input[CONF_FAST_INTERVAL] > user_input[CONF_MAX_INTERVAL]:
+                errors["base"] = "invalid_interval"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_FAST_INTERVAL, default=options.get(CONF_FAST_INTERVAL, DEFAULT_FAST_INTERVAL)):
+                    vol.All(vol.Coerce(int), vol.Range(min=5, max=300)),
+                vol.Required(CONF_MAX_INTERVAL, default=options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL)):
+                    vol.All(vol.Coerce(int), vol.Range(min=10, max=3600)),
+                vol.Required(CONF_BUS_BUDGET, default=options.get(CONF_BUS_BUDGET, DEFAULT_BUS_BUDGET)):
+                    vol.All(vol.Coerce(int), vol.Range(min=5, max=100)),
+                vol.Required(CONF_TEMP_DEADBAND, default=options.get(CONF_TEMP_DEADBAND, DEFAULT_TEMP_DEADBAND)):
+                    vol.All(vol.Coerce(float), vol.Range(min=0, max=2)),
+                vol.Required(CONF_CLOCK_SYNC_HOURS, default=options.get(CONF_CLOCK_SYNC_HOURS, DEFAULT_CLOCK_SYNC_HOURS)):
+                    vol.All(vol.Coerce(int), vol.Range(min=0, max=168)),
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
+
 class CannotConnect(exceptions.HomeAssistantError):
     #_LOGGER.debug("[RS] CannotConnect called with: {}".format(exceptions.HomeAssistantError))
     """Error to indicate we cannot connect."""
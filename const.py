@@ -8,6 +8,30 @@ from homeassistant.const import ATTR_ENTITY_ID
 
 DOMAIN = "heatmiser_rs"
 
+# Entry data key for the thermos found by discovery (so restarts skip the bus scan)
+CONF_THERMOS = "thermos"
+
+# hass.data[DOMAIN] key for the UH1Group every config entry's hub joins
+DATA_HUBS = "hubs"
+
+# Options flow - adaptive polling (intervals in seconds, bus budget in percent)
+CONF_FAST_INTERVAL = "fast_interval"
+CONF_MAX_INTERVAL = "max_interval"
+CONF_BUS_BUDGET = "bus_budget"
+CONF_TEMP_DEADBAND = "temp_deadband"
+CONF_CLOCK_SYNC_HOURS = "clock_sync_hours"
+DEFAULT_FAST_INTERVAL = 10
+DEFAULT_MAX_INTERVAL = 60
+DEFAULT_BUS_BUDGET = 50
+DEFAULT_TEMP_DEADBAND = 0.2     # Room temperature must move this much (C) before the entity reports it
+DEFAULT_CLOCK_SYNC_HOURS = 0    # How often drifted thermo clocks are put right, 0 = only via the service
+FAST_POLL_WINDOW = 120      # How long to keep polling fast after a write or a change
+
+# Per config entry storage (learned bus timing and the last DCB snapshots), saved every interval seconds
+STORAGE_VERSION = 1
+STORAGE_KEY = DOMAIN + ".{}"
+STORAGE_SAVE_INTERVAL = 600
+
 ATTR_DAY = "day"
 ATTR_SET_TIME = "set_time" 
 ATTR_TIME_1 = "time1" 
@@ -45,3 +69,41 @@ SET_DAYTIME_SCHEMA = {
         vol.Required(ATTR_SET_TIME): cv.time,
     }
 
+# Hub level bulk schedule service - any of the four blocks, for the targeted (default all) thermos
+SERVICE_SET_SCHEDULES = "set_schedules"
+ATTR_HEAT_WEEKDAY = "heat_weekday"
+ATTR_HEAT_WEEKEND = "heat_weekend"
+ATTR_DHW_WEEKDAY = "dhw_weekday"
+ATTR_DHW_WEEKEND = "dhw_weekend"
+ATTR_TIME = "time"
+ATTR_TEMP = "temperature"
+ATTR_ON = "on"
+ATTR_OFF = "off"
+
+HEAT_PERIODS_SCHEMA = vol.All(cv.ensure_list, vol.Length(min=1, max=4), [vol.Schema({
+        vol.Required(ATTR_TIME): cv.time,
+        vol.Required(ATTR_TEMP): vol.All(vol.Coerce(int), vol.Range(min=5, max=35)),
+    })])
+DHW_PERIODS_SCHEMA = vol.All(cv.ensure_list, vol.Length(min=1, max=4), [vol.Schema({
+        vol.Required(ATTR_ON): cv.time,
+        vol.Required(ATTR_OFF): cv.time,
+    })])
+SET_SCHEDULES_SCHEMA = vol.Schema({
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(ATTR_HEAT_WEEKDAY): HEAT_PERIODS_SCHEMA,
+        vol.Optional(ATTR_HEAT_WEEKEND): HEAT_PERIODS_SCHEMA,
+        vol.Optional(ATTR_DHW_WEEKDAY): DHW_PERIODS_SCHEMA,
+        vol.Optional(ATTR_DHW_WEEKEND): DHW_PERIODS_SCHEMA,
+    })
+
+# Hub level clock sync - only thermos whose clock has drifted more than threshold seconds are written
+SERVICE_SYNC_CLOCKS = "sync_clocks"
+ATTR_THRESHOLD = "threshold"
+SYNC_CLOCKS_SCHEMA = vol.Schema({
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(ATTR_THRESHOLD): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+    })
+
+# Hub level rescan - probe every bus address again and add any thermos found since setup
+SERVICE_RESCAN = "rescan"
+RESCAN_SCHEMA = vol.Schema({})
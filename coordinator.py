@@ -1,12 +1,34 @@
 """Platform for climate integration."""
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from .heatmiserRS import UH1
-from .const import DOMAIN
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from .heatmiserRS import UH1, UH1Group, CLOCK_DRIFT_THRESHOLD
+from .const import (
+    DOMAIN,
+    CONF_THERMOS,
+    DATA_HUBS,
+    CONF_FAST_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_BUS_BUDGET,
+    CONF_TEMP_DEADBAND,
+    CONF_CLOCK_SYNC_HOURS,
+    DEFAULT_FAST_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_BUS_BUDGET,
+    DEFAULT_TEMP_DEADBAND,
+    DEFAULT_CLOCK_SYNC_HOURS,
+    FAST_POLL_WINDOW,
+    STORAGE_VERSION,
+    STORAGE_KEY,
+)
 from datetime import timedelta
 import logging
+import time
 
 _LOGGER = logging.getLogger(__name__)
 DEFAULT_TEMP = 16
+CYCLE_TIME_SMOOTHING = 0.3      # Weight of the newest poll in the average cycle time
 
 class HMCoordinator(DataUpdateCoordinator):
     """My custom coordinator."""
@@ -14,16 +36,34 @@ class HMCoordinator(DataUpdateCoordinator):
     def __init__(self, hass, config_entry, socket_str):
         """Initialize my coordinator."""
         _LOGGER.debug("[RS] Coordinator _init_ with socket= {}".format(socket_str))
-        
+
+        options = config_entry.options
+        self.fast_interval = options.get(CONF_FAST_INTERVAL, DEFAULT_FAST_INTERVAL)
+        self.max_interval = max(options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL), self.fast_interval)
+        self.bus_budget = options.get(CONF_BUS_BUDGET, DEFAULT_BUS_BUDGET) / 100
+        self.temp_deadband = options.get(CONF_TEMP_DEADBAND, DEFAULT_TEMP_DEADBAND)
+        self.clock_sync_hours = options.get(CONF_CLOCK_SYNC_HOURS, DEFAULT_CLOCK_SYNC_HOURS)
+
         super().__init__(
             hass,
             _LOGGER,    # Name of the data. For logging purposes.
             name=f"{DOMAIN} ({config_entry.unique_id})",
             update_method=self.async_update_data,  # method to call on update interval
-            update_interval=timedelta(seconds=60),   # Polling interval. Will only be polled if there are subscribers.
+            update_interval=timedelta(seconds=self.fast_interval),   # Adapted after every poll, see _adapt_interval
             )
 
-        self.uh1 = UH1(socket_str)
+        self._entry = config_entry
+        self.hub_id = config_entry.entry_id     # Prefix for unique ids so thermo 1 on two hubs do not clash
+        self.uh1 = UH1(socket_str, config_entry.data.get(CONF_THERMOS))
+        # Every hub runs its own bus loop, the shared group only totals their metrics for diagnostics
+        self.hubs: UH1Group = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_HUBS, UH1Group())
+        self.hubs.add(self.uh1)
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY.format(config_entry.entry_id))
+        self.cycle_time = None      # Smoothed duration of a full poll in seconds
+        self._fast_until = time.monotonic() + FAST_POLL_WINDOW
+        self._last_poll = 0.0
+        self._signature = None
+        self._restored = False      # Thermos start from saved snapshots so the first poll can wait
 
     async def _async_setup(self):
         """Set up the coordinator
@@ -33,6 +73,84 @@ class HMCoordinator(DataUpdateCoordinator):
         """
         _LOGGER.debug("[RS] Coordinator _async_setup called with uh1 = {}".format(self.uh1))
         #await self.uh1.async_open_connection()
+        if not self.uh1.thermos:
+            # First start - scan the bus and keep what we find in the entry so we never scan again
+            topology = await self.uh1.async_discover()
+            if not topology:
+                raise UpdateFailed("No thermostats answered on {}".format(self.uh1.socket))
+            self.hass.config_entries.async_update_entry(self._entry, data={**self._entry.data, CONF_THERMOS: topology})
+        stored = await self._store.async_load() or {}
+        if "timing" in stored:
+            self.uh1.set_timing_profile(stored["timing"])
+        else:
+            # First run - time the bus once so polls do not start from worst case guesses
+            await self.uh1.async_calibrate()
+            await self.async_save()
+        self._restored = self.uh1.restore_snapshots(stored.get("snapshots", {})) > 0
+
+    def thermo_key(self, thermo) -> str:
+        """Thermo id that is unique across hubs, for entity unique ids and device identifiers"""
+        return "{}_{}".format(self.hub_id, thermo._id)
+
+    def _storage_data(self) -> dict:
+        return {"timing": self.uh1.get_timing_profile(), "snapshots": self.uh1.get_snapshots()}
+
+    async def async_shutdown(self) -> None:
+        """Close the persistent UH1 connection when the coordinator is torn down"""
+        _LOGGER.debug("[RS] Coordinator async_shutdown closing uh1 = {}".format(self.uh1))
+        await super().async_shutdown()
+        await self.async_save()
+        self.hubs.remove(self.uh1)
+        await self.uh1.async_close()
+
+    async def async_save(self, _now=None) -> None:
+        """Store the learned timing and snapshots, also the STORAGE_SAVE_INTERVAL callback"""
+        await self._store.async_save(self._storage_data())
+
+    async def async_sync_clocks(self, _now=None, thermos=None, threshold=CLOCK_DRIFT_THRESHOLD) -> dict:
+        """Put drifted thermo clocks right to HA's local time, also the clock_sync_hours interval callback"""
+        results = await self.uh1.async_sync_clocks(dt_util.now, threshold, thermos)
+        _LOGGER.debug("[RS] Coordinator clock sync: {}".format(results))
+        return results
+
+    async def async_rescan(self) -> list[dict]:
+        """
+        Scan the bus again for thermos added since setup, keeping the ones already known. A changed
+        topology goes into the entry, whose update listener reloads it to add the new entities
+        """
+        topology = await self.uh1.async_discover(keep_known=True)
+        if topology != self._entry.data.get(CONF_THERMOS):
+            _LOGGER.info("[RS] Rescan of {} found thermos {}".format(self.uh1.socket, [t["id"] for t in topology]))
+            self.hass.config_entries.async_update_entry(self._entry, data={**self._entry.data, CONF_THERMOS: topology})
+        return topology
+
+    @callback
+    def async_boost(self) -> None:
+        """Poll fast for a while, e.g. straight after a service call wrote to a thermo"""
+        self._fast_until = time.monotonic() + FAST_POLL_WINDOW
+        if self.update_interval.total_seconds() > self._interval_floor(self.fast_interval):
+            self.update_interval = timedelta(seconds=self._interval_floor(self.fast_interval))
+            self._schedule_refresh()
+
+    def _interval_floor(self, interval) -> float:
+        """Never poll so often that the bus is busier than the configured budget"""
+        if self.cycle_time is None:
+            return interval
+        return max(interval, self.cycle_time / self.bus_budget)
+
+    def _adapt_interval(self, changed: bool) -> None:
+        """Fast after writes/changes, doubling back towards the ceiling while things stay quiet"""
+        now = time.monotonic()
+        if changed or self.uh1.last_write > self._last_poll:
+            self._fast_until = now + FAST_POLL_WINDOW
+        if now < self._fast_until:
+            interval = self.fast_interval
+        else:
+            interval = min(self.update_interval.total_seconds() * 2, self.max_interval)
+        interval = self._interval_floor(interval)
+        if interval != self.update_interval.total_seconds():
+            _LOGGER.debug("[RS] Coordinator poll interval now {:.1f}s".format(interval))
+            self.update_interval = timedelta(seconds=interval)
 
     async def async_update_data(self):
         """Fetch data from API endpoint.
@@ -45,6 +163,29 @@ class HMCoordinator(DataUpdateCoordinator):
             # Note: using context is not required if there is no need or ability to limit
             # data retrieved from API.
         _LOGGER.debug("[RS] Coordinator _async_update_data called with uh1 = {}".format(self.uh1))
-        return await self.uh1.async_read_dcbs()
-
+        if self._restored:
+            # Setup only waits for this first refresh - let entities come up on the saved (stale)
+            # snapshots and do the real poll in the background so startup never waits on the bus
+            self._restored = False
+            self._entry.async_create_background_task(self.hass, self.async_refresh(), "heatmiser_rs first poll")
+            return True
+        tic = time.monotonic()
+        try:
+            result = await self.uh1.async_poll()
+        except ConnectionError as e:
+            # Fail the update so every entity goes unavailable rather than showing old (or restored) state
+            raise UpdateFailed(str(e)) from e
+        toc = time.monotonic()
+        duration = toc - tic
+        if self.cycle_time is None:
+            self.cycle_time = duration
+        else:
+            self.cycle_time += CYCLE_TIME_SMOOTHING * (duration - self.cycle_time)
 
+        # Heat demand or target changing means something is happening so keep a close eye on it
+        signature = tuple((t.get_heat_status(), t.get_target_temp()) for t in self.uh1.thermos)
+        changed = self._signature is not None and signature != self._signature
+        self._signature = signature
+        self._adapt_interval(changed)
+        self._last_poll = tic
+        return result
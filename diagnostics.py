@@ -0,0 +1,28 @@
+"""Diagnostics download for heatmiser_rs - connection state, learned timing and bus metrics (this hub and all of them)"""
+from __future__ import annotations
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+TO_REDACT = {CONF_HOST}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Everything we know about the bus, e.g. to find the slow thermo or flaky bridge"""
+    coordinator = entry.runtime_data.coordinator
+    uh1 = coordinator.uh1
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "poll_interval": coordinator.update_interval.total_seconds(),
+        "thermos": [
+            {**t, "online": thermo.online, "stale": thermo.stale, "dcb_length": thermo.dcb_length,
+             "health": thermo.health.as_dict(),
+             "history_samples": len(thermo.history), **thermo.history.stats()}
+            for t, thermo in zip(uh1.topology, uh1.thermos)
+        ],
+        "timing": uh1.get_timing_profile(),
+        "metrics": uh1.get_metrics(),
+        "all_hubs": coordinator.hubs.get_metrics(per_hub=False),
+    }
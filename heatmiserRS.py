@@ -8,8 +8,17 @@ from __future__ import annotations
 
 import asyncio
 import async_timeout
+from array import array
+import bisect
+import functools
+import heapq
+from collections import deque
 import serial_asyncio_fast as serial_asyncio
 #import serial_asyncio
+import socket
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
 
 import logging, traceback
 _LOGGER = logging.getLogger(__name__)
@@ -18,6 +27,62 @@ BYTEMASK = 0xff
 MASTER_ADDR = 0x81     # Master address used (must be 129-160)
 MAX_CHANS = 8
 TIMEOUT = 1
+CONNECT_TIMEOUT = 5
+
+#Learned timing (seconds) - timeouts come from each thermo's rolling response times, kept apart for
+#full DCB reads and for short answers (range reads, probes, write ACKs) as a full read can take several
+#times as long. The gap between frames shrinks while the bus keeps up and widens again when a live thermo misses one
+TIMING_WINDOW = 50
+TIMING_MIN_SAMPLES = 5
+TIMEOUT_MARGIN = 2.0
+TIMEOUT_FLOOR = 0.15
+GAP_FLOOR = 0.01
+GAP_CEILING = 0.2
+GAP_SHRINK = 0.9
+CALIBRATION_ROUNDS = 3
+
+#Thermo bus addresses the V3 protocol allows, discovery probes them all (reading just the model byte, so the
+#answer is short at any baud rate) and waits this long for an empty one
+THERMO_ADDRESSES = range(1, 33)
+DISCOVERY_ADDRESSES = THERMO_ADDRESSES
+DISCOVERY_TIMEOUT = 0.3
+
+#Per thermo health - a thermo is suspect from its first missed answer and offline after OFFLINE_MISSES
+#in a row, then it is left out of polls and probed with a delay that doubles up to PROBE_MAX_DELAY
+HEALTH_ONLINE = "online"
+HEALTH_SUSPECT = "suspect"
+HEALTH_OFFLINE = "offline"
+OFFLINE_MISSES = 3
+PROBE_MIN_DELAY = 30
+PROBE_MAX_DELAY = 900
+PROBE_TIMEOUT = DISCOVERY_TIMEOUT
+
+#Bus metrics - latency histogram bucket upper bounds (seconds, slower lands in a last +inf bucket)
+#and the operation names they are kept per thermo for
+LATENCY_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+OP_DCB = "read_dcb"
+OP_RANGE = "read_range"
+OP_WRITE = "write"
+
+#Bus transaction priorities (lowest runs first)
+PRIO_WRITE = 0
+PRIO_READ = 1
+PRIO_POLL = 2
+
+#Connection manager states and reconnect backoff (seconds)
+CONN_DISCONNECTED = "disconnected"
+CONN_CONNECTING = "connecting"
+CONN_CONNECTED = "connected"
+CONN_BACKOFF = "backoff"
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 60
+KEEPALIVE_IDLE = 30
+KEEPALIVE_INTERVAL = 10
+KEEPALIVE_COUNT = 3
+ACK_LEN = 7         # dest, len lo, len hi, source, function, crc lo, crc hi
+MAX_FRAME_LEN = 512     # Largest DCB (~300 bytes) plus header and CRC, anything longer is garbage
+DCB_LEN_FULL = 0xffff   # Read length meaning 'whole DCB' when the exact length is not known yet
+
 READ=0
 WRITE=1
 #Thermo models
@@ -62,143 +127,1310 @@ WEEKEND_ADDRW = 59
 WEEKDAY_DHW_ADDRW = 71
 WEEKEND_DHW_ADDRW = 87
 
+#Per model DCB read offsets for the fields that move - PRTHW has the hot water state at 36 so the rest shift by one
+DCB_LAYOUTS = {
+    PRT: {"day": DAY_ADDR, "time": TIME_ADDR, "weekday": WEEKDAY_ADDR, "weekend": WEEKEND_ADDR},
+    PRTHW: {"day": DAY_ADDR+1, "time": TIME_ADDR+1, "weekday": WEEKDAY_ADDR+1, "weekend": WEEKEND_ADDR+1,
+            "dhw": DHW_ADDR, "weekday_dhw": WEEKDAY_DHW_ADDR, "weekend_dhw": WEEKEND_DHW_ADDR},
+}
+HEAT_SCHED_LEN = 12     # 4 x (hour, mins, temp)
+DHW_SCHED_LEN = 16      # 4 x (on hour, on mins, off hour, off mins)
+HEAT_PERIOD_UNUSED = [24, 0, 15]        # Hour 24 marks a period as not used
+DHW_PERIOD_UNUSED = [24, 0, 24, 0]
+
+#Schedule blocks a bulk update can set: name -> (write address, hot water, weekend)
+SCHED_HEAT_WEEKDAY = "heat_weekday"
+SCHED_HEAT_WEEKEND = "heat_weekend"
+SCHED_DHW_WEEKDAY = "dhw_weekday"
+SCHED_DHW_WEEKEND = "dhw_weekend"
+SCHEDULE_BLOCKS = {
+    SCHED_HEAT_WEEKDAY: (WEEKDAY_ADDRW, False, False),
+    SCHED_HEAT_WEEKEND: (WEEKEND_ADDRW, False, True),
+    SCHED_DHW_WEEKDAY: (WEEKDAY_DHW_ADDRW, True, False),
+    SCHED_DHW_WEEKEND: (WEEKEND_DHW_ADDRW, True, True),
+}
+
+#Where each write address lands in the DCB we read back: (write addr, read offset or layout key, length)
+WRITE_FIELDS = [
+    (AWAYTEMP_ADDR, AWAYTEMP_ADDR, 1),
+    (TARGET_ADDR, TARGET_ADDR, 1),
+    (RUNMODE_ADDR, RUNMODE_ADDR, 1),
+    (HOLIDAYLEN_ADDR, HOLIDAYLEN_ADDR+1, 1),    # Written lo, hi but read back hi, lo
+    (HOLIDAYLEN_ADDR+1, HOLIDAYLEN_ADDR, 1),
+    (DHW_ADDRW, "dhw", 1),
+    (DAYTIME_ADDRW, "day", 4),      # day, hours, mins, secs
+    (WEEKDAY_ADDRW, "weekday", HEAT_SCHED_LEN),
+    (WEEKEND_ADDRW, "weekend", HEAT_SCHED_LEN),
+    (WEEKDAY_DHW_ADDRW, "weekday_dhw", DHW_SCHED_LEN),
+    (WEEKEND_DHW_ADDRW, "weekend_dhw", DHW_SCHED_LEN),
+]
+
+def _write_maps():
+    """Per model {write address: DCB read offset} for every byte of every known writable field"""
+    maps = {}
+    for model, layout in DCB_LAYOUTS.items():
+        wmap = {}
+        for waddr, raddr, length in WRITE_FIELDS:
+            if isinstance(raddr, str):
+                if raddr not in layout:
+                    continue    # e.g. hot water fields on a PRT
+                raddr = layout[raddr]
+            for i in range(length):
+                wmap[waddr+i] = raddr+i
+        maps[model] = wmap
+    return maps
+
+WRITE_TO_READ = _write_maps()
+DCB_MIN_LEN = TIME_ADDR + 4     # Shortest DCB that holds every scalar field we decode
+
+#Refresh tiers - hot fields (room temp, heat and hot water state) are read every poll, warm ones (target,
+#away temp, run mode, holiday) every WARM_EVERY polls and cold ones (schedules, model, clock) come with a
+#full DCB read every COLD_PERIOD seconds or after a write. Tiers due together go out as one range read
+TIER_HOT = "hot"
+TIER_WARM = "warm"
+TIER_COLD = "cold"
+WARM_EVERY = 5
+COLD_PERIOD = 3600
+
+def _tier_ranges():
+    """Per model {tier: (DCB read offset, length)} for the tiers that are range reads"""
+    ranges = {}
+    for model, layout in DCB_LAYOUTS.items():
+        hot_end = layout.get("dhw", HEAT_ADDR) + 1
+        ranges[model] = {
+            TIER_HOT: (ROOMTEMP_ADDR, hot_end - ROOMTEMP_ADDR),
+            TIER_WARM: (AWAYTEMP_ADDR, HOLIDAYLEN_ADDR + 2 - AWAYTEMP_ADDR),
+        }
+    return ranges
+
+TIER_RANGES = _tier_ranges()
+
+WRITE_DEBOUNCE = 0.3    # Quiet time before queued writes go out (seconds)
+WRITE_MAX_DELAY = 1.0   # Longest a write is held back while more keep arriving
+
+HISTORY_SIZE = 720         # Poll samples kept per thermo, the whole window even at the fastest (5s) poll interval
+HISTORY_WINDOW = 3600      # Seconds of history the rate and duty cycle figures cover
+HISTORY_MAX_GAP = 600      # Longer gaps between samples (thermo or hub offline) are left out
+HISTORY_MIN_SPAN = 300     # Seconds of heating (or cooling) needed before quoting a rate
+
+CLOCK_DRIFT_THRESHOLD = 60      # Seconds a thermo clock may be out before a clock sync rewrites it
+WEEK_SECS = 7 * 86400
+
+class FrameDecoder:
+    """
+    Incremental scanner for V3 response frames in the raw byte stream from the bridge.
+    Skips our own RS-485 echo and anything that cannot start a response, checks each
+    candidate's length, source and function and resynchronises on the next candidate,
+    so a stray or corrupt byte costs at most the frame it landed in
+    """
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._echo = b""
+        self.discarded = 0      # Bytes thrown away as echo or garbage
+
+    def expect_echo(self, frame):
+        """frame is about to go out - if the link echoes it back, drop it rather than scan it"""
+        self._echo = bytes(frame)
+
+    def reset(self):
+        self.discarded += len(self._buf)
+        self._buf.clear()
+        self._echo = b""
+
+    @staticmethod
+    def _frame_length(buf) -> int:
+        """Length of the response starting at buf[0], None until there is enough to tell, 0 if it is not one"""
+        n = len(buf)
+        if n < 3:
+            return None
+        frame_len = buf[1] | (buf[2]<<8)
+        if not ACK_LEN <= frame_len <= MAX_FRAME_LEN:
+            return 0
+        if n < 5:
+            return 0 if n == 4 and buf[3] not in THERMO_ADDRESSES else None
+        if buf[3] not in THERMO_ADDRESSES:
+            return 0
+        if buf[4] == WRITE:
+            return frame_len if frame_len == ACK_LEN else 0
+        if buf[4] != READ:
+            return 0
+        if n < 9:
+            return None
+        return frame_len if frame_len == 9 + (buf[7] | (buf[8]<<8)) + 2 else 0
+
+    def feed(self, data) -> list[tuple[bytes, bool]]:
+        """Add received bytes and return (frame, CRC ok) for every complete frame found"""
+        buf = self._buf
+        buf += data
+        frames = []
+        while buf:
+            if self._echo:
+                n = min(len(buf), len(self._echo))
+                if buf[:n] == self._echo[:n]:
+                    if n < len(self._echo):
+                        break
+                    self.discarded += n
+                    del buf[:n]
+                    self._echo = b""
+                    continue
+                self._echo = b""    # This link does not echo
+            start = buf.find(MASTER_ADDR)
+            if start < 0:
+                self.discarded += len(buf)
+                buf.clear()
+                break
+            if start:
+                self.discarded += start
+                del buf[:start]
+            length = self._frame_length(buf)
+            if length is None:
+                break
+            if length == 0:
+                self.discarded += 1
+                del buf[0]
+                continue
+            if len(buf) < length:
+                break
+            # Header was consistent so a bad CRC means a corrupt body - the whole frame goes
+            frame = bytes(buf[:length])
+            del buf[:length]
+            frames.append((frame, CRC16.verify(frame)))
+        return frames
+
+class UH1Protocol(asyncio.Protocol):
+    """Runs everything the bridge sends through a FrameDecoder and queues the frames for UH1"""
+    def __init__(self) -> None:
+        self.transport: asyncio.Transport = None
+        self.decoder = FrameDecoder()
+        self.frames = deque()       # (frame, CRC ok) not yet claimed by a transaction
+        self.closed = False
+        self.lost: asyncio.Future = None     # Done once the transport has really gone
+        self._waiter: asyncio.Future = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.lost = asyncio.get_running_loop().create_future()
+
+    def data_received(self, data):
+        frames = self.decoder.feed(data)
+        if frames:
+            self.frames.extend(frames)
+            self._wake()
+
+    def connection_lost(self, exc):
+        _LOGGER.debug("[RS] Connection lost {}".format(exc))
+        self.closed = True
+        if self.lost is not None and not self.lost.done():
+            self.lost.set_result(exc)
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def async_next_frame(self) -> tuple[bytes, bool]:
+        """Next (frame, CRC ok) off the line, ConnectionError once the link has gone"""
+        while not self.frames:
+            if self.closed:
+                raise ConnectionError("connection to the bridge was lost")
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self.frames.popleft()
+
+    def discard(self):
+        """Forget anything received but unclaimed, e.g. a late reply to a timed-out request"""
+        if self.frames:
+            _LOGGER.debug("[RS] Discarded stale frames: {}".format([list(f) for f, _ in self.frames]))
+            self.frames.clear()
+        self.decoder.reset()
+
+class UH1Connection:
+    """
+    Long-lived link to the eth:serial bridge (or a local serial port) owned by UH1.
+    Connects lazily on first use, backs off exponentially when the bridge is down and
+    drops the link when it looks half-open so the next transaction reconnects
+    """
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.transport: asyncio.Transport = None
+        self.protocol: UH1Protocol = None
+        self.state = CONN_DISCONNECTED
+        self.reconnects = 0
+        self._delay = RECONNECT_MIN_DELAY
+        self._next_attempt = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self.state == CONN_CONNECTED
+
+    def _healthy(self) -> bool:
+        """Cheap check that the transport has not been closed or lost under us"""
+        if self.transport is None or self.protocol is None:
+            return False
+        return not (self.transport.is_closing() or self.protocol.closed)
+
+    async def async_connect(self) -> bool:
+        """Return True once a usable link exists, (re)connecting only if needed"""
+        if self.state == CONN_CONNECTED and self._healthy():
+            return True
+        async with self._lock:
+            if self.state == CONN_CONNECTED:
+                if self._healthy():
+                    return True
+                _LOGGER.info("[RS] Connection to {} lost - reconnecting".format(self.url))
+                self._teardown()
+            if time.monotonic() < self._next_attempt:
+                _LOGGER.debug("[RS] In reconnect backoff for another {:.1f}s".format(self._next_attempt - time.monotonic()))
+                return False
+            self.state = CONN_CONNECTING
+            try:
+                async with async_timeout.timeout(CONNECT_TIMEOUT):
+                    self.transport, self.protocol = await self._async_open()
+            except Exception as e:
+                _LOGGER.error("Error opening connection {}".format(e))
+                _LOGGER.debug(traceback.format_exc())
+                self.transport = self.protocol = None
+                self.state = CONN_BACKOFF
+                self._next_attempt = time.monotonic() + self._delay
+                self._delay = min(self._delay * 2, RECONNECT_MAX_DELAY)
+                return False
+            self.state = CONN_CONNECTED
+            self.reconnects += 1
+            self._delay = RECONNECT_MIN_DELAY
+            self._next_attempt = 0.0
+            _LOGGER.debug("[RS] Opened with transport: {}".format(self.transport))
+            return True
+
+    async def _async_open(self):
+        loop = asyncio.get_running_loop()
+        url = urlsplit(self.url)
+        if url.scheme != "socket":
+            return await serial_asyncio.create_serial_connection(loop, UH1Protocol, self.url)
+        transport, protocol = await loop.create_connection(UH1Protocol, url.hostname, url.port)
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            self._tune_socket(sock)
+        return transport, protocol
+
+    @staticmethod
+    def _tune_socket(sock):
+        """No Nagle delay on our tiny frames and keepalive so a dead bridge is noticed"""
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE)
+        if hasattr(socket, "TCP_KEEPINTVL"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL)
+        if hasattr(socket, "TCP_KEEPCNT"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_COUNT)
+
+    def send(self, frame):
+        """Put a request on the line, dropping anything stale still waiting to be claimed"""
+        if not self._healthy():
+            raise ConnectionError("connection to {} is not open".format(self.url))
+        self.protocol.discard()
+        self.protocol.decoder.expect_echo(frame)
+        self.transport.write(frame)
+
+    async def async_next_frame(self) -> tuple[bytes, bool]:
+        if self.protocol is None:
+            raise ConnectionError("connection to {} is not open".format(self.url))
+        return await self.protocol.async_next_frame()
+
+    def invalidate(self):
+        """Mark the link suspect (e.g. half-open) so the next transaction reconnects"""
+        if self.state == CONN_CONNECTED:
+            _LOGGER.info("[RS] Dropping suspect connection to {}".format(self.url))
+        self._teardown()
+
+    def _teardown(self):
+        transport = self.transport
+        self.transport = self.protocol = None
+        self.state = CONN_DISCONNECTED
+        if transport is not None:
+            transport.close()
+
+    async def async_close(self):
+        async with self._lock:
+            protocol = self.protocol
+            self._teardown()
+            if protocol is not None and protocol.lost is not None:
+                try:
+                    async with async_timeout.timeout(CONNECT_TIMEOUT):
+                        await protocol.lost
+                except asyncio.TimeoutError:
+                    _LOGGER.debug("[RS] Gave up waiting for {} to close".format(self.url))
+
+class ResponseTimer:
+    """Rolling response times of one thermo and the timeout they imply"""
+    def __init__(self) -> None:
+        self.samples = deque(maxlen=TIMING_WINDOW)
+        self.misses = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.misses = 0
+
+    def miss(self):
+        self.misses += 1
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered)-1, round(pct/100 * (len(ordered)-1)))]
+
+    @property
+    def timeout(self) -> float:
+        """Safe margin over the slowest recent answers, back to TIMEOUT after a miss or until we know"""
+        if self.misses or len(self.samples) < TIMING_MIN_SAMPLES:
+            return TIMEOUT
+        return min(max(self.percentile(99) * TIMEOUT_MARGIN, TIMEOUT_FLOOR), TIMEOUT)
+
+class ThermoHealth:
+    """Circuit breaker for one thermo - online, suspect while it misses answers, offline and only probed"""
+    def __init__(self) -> None:
+        self.state = HEALTH_ONLINE
+        self.misses = 0
+        self.probe_delay = 0
+        self.next_probe = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.state != HEALTH_OFFLINE
+
+    def due(self, now) -> bool:
+        """Whether the thermo should be asked this poll"""
+        return self.state != HEALTH_OFFLINE or now >= self.next_probe
+
+    def answered(self) -> bool:
+        """Note an answer, True if the thermo was offline until now"""
+        recovered = self.state == HEALTH_OFFLINE
+        self.state = HEALTH_ONLINE
+        self.misses = 0
+        self.probe_delay = 0
+        return recovered
+
+    def missed(self, now) -> bool:
+        """Note a missed answer, True if that has just taken the thermo offline"""
+        self.misses += 1
+        if self.misses < OFFLINE_MISSES:
+            self.state = HEALTH_SUSPECT
+            return False
+        went_offline = self.state != HEALTH_OFFLINE
+        self.state = HEALTH_OFFLINE
+        self.probe_delay = PROBE_MIN_DELAY if went_offline else min(self.probe_delay * 2, PROBE_MAX_DELAY)
+        self.next_probe = now + self.probe_delay
+        return went_offline
+
+    def as_dict(self) -> dict:
+        return {"state": self.state, "misses": self.misses, "probe_delay": self.probe_delay}
+
+class LatencyHistogram:
+    """Bucketed response times of one thermo for one operation"""
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS)+1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else None
+
+    def as_dict(self) -> dict:
+        labels = ["<={}".format(b) for b in LATENCY_BUCKETS] + ["+inf"]
+        return {"count": self.count, "mean": self.mean, "max": self.max, "buckets": dict(zip(labels, self.counts))}
+
+class BusMetrics:
+    """
+    Running totals for every transaction UH1 puts on the bus - latency per thermo and operation,
+    timeouts, CRC failures, bytes each way and how busy the bus was over the last poll period
+    """
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.latency = {}       # (thermo id, op) -> LatencyHistogram
+        self.timeouts = {}      # thermo id -> count
+        self.crc_errors = {}    # thermo id -> count
+        self.transactions = 0
+        self.bytes_tx = 0
+        self.bytes_rx = 0
+        self.busy_time = 0.0    # Seconds spent waiting on answers since started
+        self.cycle_time = None  # Duration of the last full poll
+        self.utilisation = None     # Fraction of the last poll period the bus was busy
+        self._cycle_start = None
+        self._busy_mark = 0.0
+
+    def sent(self, nbytes):
+        self.transactions += 1
+        self.bytes_tx += nbytes
+
+    def answered(self, tstat_id, op, seconds, nbytes):
+        hist = self.latency.get((tstat_id, op))
+        if hist is None:
+            hist = self.latency[tstat_id, op] = LatencyHistogram()
+        hist.observe(seconds)
+        self.bytes_rx += nbytes
+        self.busy_time += seconds
+
+    def timed_out(self, tstat_id, seconds):
+        self.timeouts[tstat_id] = self.timeouts.get(tstat_id, 0) + 1
+        self.busy_time += seconds
+
+    def crc_error(self, tstat_id, nbytes):
+        self.crc_errors[tstat_id] = self.crc_errors.get(tstat_id, 0) + 1
+        self.bytes_rx += nbytes
+
+    def begin_cycle(self):
+        now = time.monotonic()
+        if self._cycle_start is not None and now > self._cycle_start:
+            self.utilisation = min((self.busy_time - self._busy_mark) / (now - self._cycle_start), 1.0)
+        self._cycle_start = now
+        self._busy_mark = self.busy_time
+
+    def end_cycle(self):
+        self.cycle_time = time.monotonic() - self._cycle_start
+
+    def thermo_latency(self, tstat_id, op=OP_DCB) -> float:
+        """Mean response time of one thermo for op, None until it has answered one"""
+        hist = self.latency.get((tstat_id, op))
+        return None if hist is None else hist.mean
+
+    def thermo_histograms(self, tstat_id) -> dict:
+        """{op: histogram dict} of one thermo"""
+        return {op: h.as_dict() for (t, op), h in self.latency.items() if t == tstat_id}
+
+    def as_dict(self) -> dict:
+        """JSON friendly copy of everything, e.g. for HA diagnostics"""
+        return {
+            "uptime": time.monotonic() - self.started,
+            "transactions": self.transactions,
+            "bytes_tx": self.bytes_tx,
+            "bytes_rx": self.bytes_rx,
+            "timeouts": sum(self.timeouts.values()),
+            "crc_errors": sum(self.crc_errors.values()),
+            "cycle_time": self.cycle_time,
+            "utilisation": self.utilisation,
+            "thermos": {
+                str(tid): {
+                    "timeouts": self.timeouts.get(tid, 0),
+                    "crc_errors": self.crc_errors.get(tid, 0),
+                    "latency": self.thermo_histograms(tid),
+                }
+                for tid in sorted({t for t, _ in self.latency} | set(self.timeouts) | set(self.crc_errors))
+            },
+        }
+
+class BusScheduler:
+    """
+    Runs every transaction on the half-duplex RS-485 bus one at a time, most urgent first.
+    A transaction submitted with the same key as one still waiting shares its result
+    rather than going on the bus twice (e.g. overlapping polls of the same thermo)
+    """
+    def __init__(self) -> None:
+        self._queue = []        # heap of (priority, seq, key)
+        self._jobs = {}         # seq -> (func, args, [futures])
+        self._waiting = {}      # key -> seq for merging
+        self._seq = 0
+        self._worker: asyncio.Task = None
+        self.merged = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def async_submit(self, priority, key, func, *args):
+        """Queue func(*args) as a bus transaction and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        seq = self._waiting.get(key) if key is not None else None
+        if seq is not None:
+            self.merged += 1
+            self._jobs[seq][2].append(future)
+        else:
+            self._seq += 1
+            seq = self._seq
+            self._jobs[seq] = (func, args, [future])
+            if key is not None:
+                self._waiting[key] = seq
+            heapq.heappush(self._queue, (priority, seq, key))
+        if self._worker is None:
+            self._worker = loop.create_task(self._async_run())
+        return await future
+
+    async def _async_run(self):
+        try:
+            while self._queue:
+                priority, seq, key = heapq.heappop(self._queue)
+                if key is not None:
+                    self._waiting.pop(key, None)
+                func, args, futures = self._jobs.pop(seq)
+                if all(f.done() for f in futures):
+                    continue    # Everyone waiting on it was cancelled
+                try:
+                    result = await func(*args)
+                except asyncio.CancelledError:
+                    for f in futures:
+                        f.cancel()
+                    raise
+                except Exception as e:
+                    for f in futures:
+                        if not f.done():
+                            f.set_exception(e)
+                else:
+                    for f in futures:
+                        if not f.done():
+                            f.set_result(result)
+        finally:
+            self._worker = None
+
+    async def async_stop(self):
+        """Fail anything still queued and stop the worker"""
+        worker = self._worker
+        for seq in list(self._jobs):
+            for f in self._jobs.pop(seq)[2]:
+                if not f.done():
+                    f.cancel()
+        self._queue.clear()
+        self._waiting.clear()
+        if worker is not None:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+
 class UH1:
     """Hub for heatmiser control"""
     manufacturer = "Heatmiser"
 
-    def __init__(self, socket: str) -> None:
-        """Init dummy hub."""
+    def __init__(self, socket: str, topology: list[dict] = None) -> None:
+        """
+        Init hub. topology is what async_discover found last time (see UH1.topology),
+        without it there are no thermos until async_discover is run
+        """
         _LOGGER.debug("[RS] UH1 __init__ called with socket: {}".format(socket))
         self.socket = socket
         self.id = socket.lower()
         self.thermos = [
-            Thermostat(self, f"1", f"Kitchen", PRTHW),
-            Thermostat(self, f"2", f"Boot Room"),
-            Thermostat(self, f"3", f"Living Room"),
-            Thermostat(self, f"4", f"Downstairs"),
-            Thermostat(self, f"5", f"Upstairs"),
+            Thermostat(self, str(t["id"]), t["name"], t["model"])
+            for t in topology or []
         ]
-        self.online = False
-        self.reader: asyncio.StreamReader = None
-        self.writer: asyncio.StreamWriter = None
+        self.conn = UH1Connection(socket)
+        self.bus = BusScheduler()
+        self.metrics = BusMetrics()
+        self.gap = GAP_CEILING      # Learned quiet time between the last answer and the next frame
+        self._last_rx = 0.0
+        self.last_write = 0.0       # time.monotonic() of the last acknowledged write
+        self.verify_writes = False  # Read back the written range after every write
+        self.warm_every = WARM_EVERY
+        self.cold_period = COLD_PERIOD
+        self.cycles = 0             # Tiered polls so far, paces the warm tier
 
     def __del__(self):
        _LOGGER.info("[RS] UH1_com __del__ called - nothing to do")
- 
+
+    @property
+    def connection_state(self) -> str:
+        """One of CONN_DISCONNECTED, CONN_CONNECTING, CONN_CONNECTED or CONN_BACKOFF"""
+        return self.conn.state
+
+    @property
+    def online(self) -> bool:
+        return self.conn.connected
+
+    @property
+    def reconnects(self) -> int:
+        """Times the link had to be re-established after the first connect"""
+        return max(self.conn.reconnects - 1, 0)
+
+    def get_metrics(self) -> dict:
+        """Bus metrics (see BusMetrics.as_dict) plus the connection's own counters"""
+        metrics = self.metrics.as_dict()
+        metrics["reconnects"] = self.reconnects
+        metrics["connection_state"] = self.conn.state
+        metrics["gap"] = self.gap
+        metrics["queued"] = self.bus.pending
+        metrics["merged"] = self.bus.merged
+        return metrics
+
     async def async_open_connection(self):
-        _LOGGER.debug("[RS] async_open_connection Opening serial port")
-        # Using stream reader and writer
+        """Make sure the shared connection is up - cheap if it already is"""
+        _LOGGER.debug("[RS] async_open_connection state is {}".format(self.conn.state))
+        return await self.conn.async_connect()
+
+    async def async_close(self):
+        """Close the shared connection, e.g. when the config entry unloads"""
+        _LOGGER.debug("[RS] async_close closing connection to {}".format(self.socket))
+        # Queued writes first, a debounced flush left behind would reopen the connection
+        for thermo in self.thermos:
+            await thermo.writes.async_cancel()
+        await self.bus.async_stop()
+        await self.conn.async_close()
+
+    async def _async_gap(self):
+        """Leave the learned quiet time after the last answer before putting another frame on the bus"""
+        delay = self._last_rx + self.gap - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _note_answer(self, thermo: Thermostat, seconds, op):
+        thermo.timer(op).record(seconds)
+        if thermo.health.answered():
+            _LOGGER.info("[RS] Thermo {} is answering again".format(thermo._id))
+        self._last_rx = time.monotonic()
+        self.gap = max(self.gap * GAP_SHRINK, GAP_FLOOR)
+
+    def _note_miss(self, thermo: Thermostat, op):
+        timer = thermo.timer(op)
+        if timer.samples and not timer.misses:
+            self.gap = min(self.gap * 2, GAP_CEILING)   # A thermo that was answering missed - back off the bus
+        timer.miss()
+        # No gap after a timeout - the bus has already been quiet for the whole of it
+        if thermo.health.missed(time.monotonic()):
+            # Stop polling it, probes will pick it up again and re-read it from scratch
+            _LOGGER.warning("[RS] Thermo {} missed {} answers in a row, offline until it answers a probe".format(
+                thermo._id, OFFLINE_MISSES))
+            thermo.online = False
+            thermo.cold_due = True
+        elif thermo.health.state == HEALTH_OFFLINE:
+            _LOGGER.debug("[RS] Thermo {} still offline, next probe in {}s".format(thermo._id, thermo.health.probe_delay))
+
+    def get_timing_profile(self) -> dict:
+        """Learned timing in a JSON friendly form, see set_timing_profile"""
+        return {
+            "gap": self.gap,
+            "thermos": {str(t._id): list(t.timing.samples) for t in self.thermos},
+            "ranges": {str(t._id): list(t.range_timing.samples) for t in self.thermos},
+        }
+
+    def set_timing_profile(self, profile: dict):
+        """Restore timing saved by get_timing_profile so a restart does not start from worst case"""
+        self.gap = min(max(profile.get("gap", GAP_CEILING), GAP_FLOOR), GAP_CEILING)
+        samples = profile.get("thermos", {})
+        ranges = profile.get("ranges", {})
+        for t in self.thermos:
+            t.timing.samples.extend(samples.get(str(t._id), []))
+            t.range_timing.samples.extend(ranges.get(str(t._id), []))
+
+    def get_snapshots(self) -> dict:
+        """Every thermo's last DCB in a JSON friendly form, see restore_snapshots"""
+        return {str(t._id): t.dcb.hex() for t in self.thermos if t.dcb is not None}
+
+    def restore_snapshots(self, snapshots: dict) -> int:
+        """Seed thermos with DCBs saved by get_snapshots so they have state before the bus answers"""
+        restored = 0
+        for t in self.thermos:
+            raw = snapshots.get(str(t._id))
+            if raw is not None and t.restore_dcb(bytes.fromhex(raw)):
+                restored += 1
+        _LOGGER.debug("[RS] Restored {} of {} thermo snapshots".format(restored, len(self.thermos)))
+        return restored
+
+    @property
+    def topology(self) -> list[dict]:
+        """The thermos on this bus in a JSON friendly form that UH1(socket, topology) accepts"""
+        return [{"id": t._id, "name": t.name, "model": t.model} for t in self.thermos]
+
+    def _probe_timeout(self, found) -> float:
+        """Short timeout for probing an address, tightened by how fast the thermos found so far answered"""
+        samples = [s for t in found for s in t.range_timing.samples]
+        if not samples:
+            return DISCOVERY_TIMEOUT
+        return min(max(max(samples) * TIMEOUT_MARGIN, TIMEOUT_FLOOR), DISCOVERY_TIMEOUT)
+
+    async def async_discover(self, addresses=DISCOVERY_ADDRESSES, keep_known=False):
+        """
+        Probe each bus address for its MODEL_ADDR byte and rebuild thermos from whatever answers,
+        then read the whole DCB of each one found with the normal timeout. Thermos already known keep
+        their state, and with keep_known stay even if they do not answer this time, so it can be run
+        again to pick up new ones. The probes are left out of the bus metrics, an empty address would
+        otherwise count as a timeout. Returns the new topology
+        """
+        _LOGGER.info("[RS] Discovering thermos at addresses {}-{}".format(addresses[0], addresses[-1]))
+        known = {t._id: t for t in self.thermos}
+        found = []
+        answered = []
+        for addr in addresses:
+            thermo = known.get(addr) or Thermostat(self, str(addr), "Thermostat {}".format(addr))
+            model = await self.async_probe(thermo, self._probe_timeout(answered), metered=False)
+            if model is not None:
+                thermo.model = model
+                _LOGGER.info("[RS] Found {} at address {}".format(thermo.get_model(), addr))
+                answered.append(thermo)
+            elif not (keep_known and addr in known):
+                continue
+            found.append(thermo)
+        self.thermos = found
+        for thermo in answered:
+            await self.async_read_dcb(thermo, None)
+        return self.topology
+
+    async def async_calibrate(self, rounds=CALIBRATION_ROUNDS):
+        """Time a few back to back DCB reads of every thermo to seed the timing model"""
+        _LOGGER.debug("[RS] async_calibrate timing {} rounds".format(rounds))
+        for _ in range(rounds):
+            for thermo in self.thermos:
+                await self.async_read_dcb(thermo, None)
+        profile = self.get_timing_profile()
+        _LOGGER.info("[RS] Calibrated gap {:.3f}s, timeouts {}".format(
+            self.gap, {t._id: round(t.timing.timeout, 3) for t in self.thermos}))
+        return profile
+
+    async def _async_response(self, thermo: Thermostat, func, start=None):
+        """
+        Wait for thermo's answer to the request just sent. Valid frames from anyone else (late replies)
+        are skipped, a corrupt frame is taken to be ours and returned as None so it costs just this one
+        """
+        while True:
+            frame, crc_ok = await self.conn.async_next_frame()
+            if not crc_ok:
+                _LOGGER.error("Thermo {}:  CRC mismatch in {}".format(thermo._id, frame.hex(" ")))
+                self.metrics.crc_error(thermo._id, len(frame))
+                return None
+            if frame[3] != thermo._id or frame[4] != func or (start is not None and (frame[5] | (frame[6]<<8)) != start):
+                _LOGGER.debug("[RS] Skipping stray frame %s", frame)
+                continue
+            return frame
+
+    async def _async_read(self, thermo: Thermostat, dcb_addr, length, timeout, op=OP_RANGE, metered=True):
+        """
+        Send a read request for length bytes from dcb_addr and return (start address, data bytes)
+        as reported in the response header, or None if the thermo did not answer in time.
+        metered False keeps it out of the bus metrics (e.g. discovery probes)
+        """
+        msg = read_frame(thermo._id, dcb_addr, length)
+        _LOGGER.debug("[RS] Writing bytes: %s", msg)
+        await self._async_gap()
+        tic = time.monotonic()
+        self.conn.send(msg)   # Write a string to trigger tsat to send back a DCB
+        if metered:
+            self.metrics.sent(len(msg))
+
+        timeout = timeout or thermo.timer(op).timeout
         try:
-            self.reader, self.writer = await serial_asyncio.open_serial_connection(url=self.socket)
-        except Exception as e:
-            _LOGGER.error("Error opening connection {}".format(e))
-            _LOGGER.error(traceback.format_exc())
-            self.online = False
+            async with async_timeout.timeout(timeout):
+                frame = await self._async_response(thermo, READ, None if length == DCB_LEN_FULL else dcb_addr)
+        except asyncio.TimeoutError:
+            # Just the one warning when the health check takes it offline, not every poll (or probe)
+            _LOGGER.debug("Thermo {}:  Error reading DCB".format(thermo._id))
+            self._note_miss(thermo, op)
+            if metered:
+                self.metrics.timed_out(thermo._id, time.monotonic() - tic)
+            return None
+        elapsed = time.monotonic() - tic
+        self._note_answer(thermo, elapsed, op)
+        if frame is None:
+            return None
+        if metered:
+            self.metrics.answered(thermo._id, op, elapsed, len(frame))
+        return frame[5] | (frame[6]<<8), frame[9:-2]
+
+    async def _async_read_dcb(self, thermo: Thermostat, timeout):
+        """
+        Read the whole DCB - asks for the exact length learnt from the last full read
+        so the thermo does not have to be asked for the 0xFFFF 'everything' length
+        """
+        length = thermo.dcb_length if thermo.dcb_length else DCB_LEN_FULL
+        response = await self._async_read(thermo, 0, length, timeout, OP_DCB)
+        if response is None:
+            return False
+        start, data = response
+        _LOGGER.debug("[RS] DCB bytes = %s", data)
+        if not thermo.update_dcb(data):
             return False
-        _LOGGER.debug("[RS] Opened with reader, writer: {} <<==>> {}".format(self.reader, self.writer))
+        # DCB starts with its own length, if it no longer matches (e.g. model swapped) ask for everything next time
+        reported = (data[0]<<8 | data[1]) if len(data) >= 2 else 0
+        thermo.dcb_length = len(data) if reported == len(data) else None
+        thermo.online = True
+        thermo.stale = False
+        thermo.full_read_at = thermo.clock_at = time.monotonic()
+        thermo.cold_due = False
         return True
 
-    async def async_read_dcb(self, thermo: Thermostat, timeout):
-        payload = 0  # Since reading - payload is zero
-        dcb_addr_lo = dcb_addr_hi = 0
-        length_lo = length_hi = 0xff  # Since reading full DCB
-        msg = [thermo._id, 10+payload, MASTER_ADDR, READ, dcb_addr_lo, dcb_addr_hi, length_lo, length_hi]
-        crc = CRC16()
-        msg = msg + crc.run(msg)        
-        _LOGGER.debug("[RS] Writing bytes: {}".format(msg))
-        self.writer.write(bytes(msg))   # Write a string to trigger tsat to send back a DCB
-        await self.writer.drain()
-
-        _LOGGER.debug("[RS] reading back 9 byte header with timeout incase no connection")
+    async def _async_poll_dcb(self, thermo: Thermostat, timeout):
+        """Bus transaction: full DCB read of one thermo"""
+        if not await self.async_open_connection():
+            _LOGGER.info("[RS] Hub offline!!!")
+            return False
         try:
-            async with async_timeout.timeout(timeout) as timer:
-                header = await self.reader.readexactly(9)    #  Setup read ready to receive the 9 header bytes
-                _LOGGER.debug("[RS] Header bytes = {}".format(list(header)))
-        except Exception as e:
-            _LOGGER.error("Thermo {}:  Error reading DCB".format(thermo._id))
-            _LOGGER.error(traceback.format_exc())
+            return await self._async_read_dcb(thermo, timeout)
+        except OSError as e:
+            _LOGGER.error("[RS] Connection failed reading thermo {}: {}".format(thermo._id, e))
             thermo.online = False
+            self.conn.invalidate()
             return False
 
-        _LOGGER.debug("[RS] reading back rest of DCB")
-        num_bytes = list(header)[7]            
-        bytes_read = await self.reader.readexactly(num_bytes+2)    #  Read DCB + CRC
-        thermo.dcb = list(bytes_read)[:-2]
-        _LOGGER.debug("[RS] DCB bytes = {}".format(thermo.dcb))
-        thermo.online = any_thermos_live = True            
-        await asyncio.sleep(0.2)    # Added delay as I think I am choking the reader with back2back DCB calls
+    async def async_read_dcb(self, thermo: Thermostat, timeout=None, priority=PRIO_READ):
+        """Read one thermo's whole DCB, shared with any identical read still waiting for the bus"""
+        return await self.bus.async_submit(priority, ("dcb", thermo._id), self._async_poll_dcb, thermo, timeout)
+
+    async def _async_read_range(self, thermo: Thermostat, dcb_addr, length, timeout):
+        """Bus transaction: range read merged into the cached DCB"""
+        if not await self.async_open_connection():
+            _LOGGER.info("[RS] Hub offline!!!")
+            return False
+        try:
+            if thermo.dcb is None:
+                return await self._async_read_dcb(thermo, timeout)
+            response = await self._async_read(thermo, dcb_addr, length, timeout)
+        except OSError as e:
+            _LOGGER.error("[RS] Connection failed reading thermo {}: {}".format(thermo._id, e))
+            thermo.online = False
+            self.conn.invalidate()
+            return False
+        if response is None:
+            return False
+        start, data = response
+        thermo.merge_dcb(start, data)
+        thermo.online = True
+        return True
+
+    async def _async_probe(self, thermo: Thermostat, timeout, metered):
+        """Bus transaction: read the single MODEL_ADDR byte, the model if the thermo answered else None"""
+        if not await self.async_open_connection():
+            _LOGGER.info("[RS] Hub offline!!!")
+            return None
+        try:
+            response = await self._async_read(thermo, MODEL_ADDR, 1, timeout, metered=metered)
+        except OSError as e:
+            _LOGGER.error("[RS] Connection failed probing thermo {}: {}".format(thermo._id, e))
+            self.conn.invalidate()
+            return None
+        if response is None or len(response[1]) != 1:
+            return None
+        return response[1][0]
+
+    async def async_probe(self, thermo: Thermostat, timeout=DISCOVERY_TIMEOUT, priority=PRIO_READ, metered=True):
+        """Is there a thermo at this address - a one byte read whose answer is quick whatever the DCB length"""
+        return await self.bus.async_submit(priority, ("probe", thermo._id), self._async_probe, thermo, timeout, metered)
+
+    async def async_read_range(self, thermo: Thermostat, dcb_addr, length, timeout=None, priority=PRIO_READ):
+        """
+        Read just length bytes from dcb_addr and merge them into the cached DCB (e.g. 2 bytes at
+        ROOMTEMP_ADDR). Falls back to a full DCB read if nothing is cached yet to merge into
+        """
+        _LOGGER.debug("[RS] async_read_range thermo %s addr %s length %s", thermo._id, dcb_addr, length)
+        key = ("range", thermo._id, dcb_addr, length)
+        return await self.bus.async_submit(priority, key, self._async_read_range, thermo, dcb_addr, length, timeout)
+
+    def due_tiers(self, thermo: Thermostat) -> list:
+        """Tiers thermo needs this poll - just TIER_COLD when a full read is due as that covers the rest"""
+        ranges = TIER_RANGES.get(thermo.model)
+        if (thermo.dcb is None or thermo.stale or thermo.cold_due or ranges is None
+                or time.monotonic() - thermo.full_read_at >= self.cold_period):
+            return [TIER_COLD]
+        tiers = [TIER_HOT]
+        if (self.cycles + thermo._id) % self.warm_every == 0:     # Spread the warm reads over the cycles
+            tiers.append(TIER_WARM)
+        return tiers
+
+    async def _async_poll_thermo(self, thermo: Thermostat):
+        if thermo.health.state == HEALTH_OFFLINE:
+            # Probe with a one byte read so the short timeout suits any DCB length or baud rate, once
+            # it answers re-read it from scratch with the normal full read timeout
+            if await self.async_probe(thermo, PROBE_TIMEOUT, PRIO_POLL) is None:
+                return False
+            thermo.cold_due = True
+            return await self.async_read_dcb(thermo, None, PRIO_POLL)
+        tiers = self.due_tiers(thermo)
+        if tiers == [TIER_COLD]:
+            return await self.async_read_dcb(thermo, None, PRIO_POLL)
+        spans = [TIER_RANGES[thermo.model][tier] for tier in tiers]
+        start = min(addr for addr, _ in spans)
+        end = max(addr + length for addr, length in spans)
+        return await self.async_read_range(thermo, start, end - start, None, PRIO_POLL)
+
+    async def async_poll(self):
+        """
+        One poll reading only the refresh tiers that are due for each thermo, so most cycles are a
+        short range read per thermo rather than the whole DCB (see TIER_RANGES)
+        """
+        _LOGGER.debug("[RS] async_poll UH1 refreshing due tiers")
+        self.cycles += 1
+        return await self._async_cycle(self._async_poll_thermo)
 
     async def async_read_dcbs(self):
         """
-        Read all DCBs in one shot via the eth:serial adapter, and store in thermo dcb array
+        Read all DCBs via the eth:serial adapter, and store in thermo dcb array. Each thermo is its
+        own background bus transaction so user writes can go out between two reads
         """
         _LOGGER.debug("[RS] async_read_dcbs UH1 refreshing all DCBs data")
+        return await self._async_cycle(lambda t: self.async_read_dcb(t, None, PRIO_POLL))
+
+    async def _async_cycle(self, read):
+        """
+        Run read(thermo) for every thermo as one timed poll cycle, offline ones only when a probe is due.
+        Raises ConnectionError if the bridge cannot be reached, so callers do not mistake the thermos'
+        last (or restored) state for a fresh poll
+        """
         if not await self.async_open_connection():
             _LOGGER.info("[RS] Hub offline!!!")
-            return False
-        any_thermos_live = False
-        for thermo in self.thermos:
-            if await self.async_read_dcb(thermo, TIMEOUT):
-                thermo.online = any_thermos_live = True                    
-        self.writer.close()
-        await self.writer.wait_closed()
-        await asyncio.sleep(0.2)
+            raise ConnectionError("UH1 {} is not reachable".format(self.socket))
+        now = time.monotonic()
+        thermos = [t for t in self.thermos if t.health.due(now)]
+        self.metrics.begin_cycle()
+        results = await asyncio.gather(*(read(t) for t in thermos))
+        self.metrics.end_cycle()
+        now = time.monotonic()
+        for thermo, ok in zip(thermos, results):
+            if ok:
+                thermo.history.record(now, thermo)
+        any_thermos_live = any(results)
+        if thermos and not any_thermos_live:
+            # Nothing answered at all - most likely a half-open socket to the bridge, so start afresh next time
+            self.conn.invalidate()
 
         return any_thermos_live         #  return status (True/False)
 
-    async def async_write_bytes(self, thermo: Thermostat, dcb_addr, datal=[]):
+    async def _async_read_ack(self, thermo: Thermostat):
+        """The V3 write ACK frame from thermo (dest, length lo, hi, source, function, CRC lo, hi) or None if corrupt"""
+        return await self._async_response(thermo, WRITE)
+
+    async def async_write_bytes(self, thermo: Thermostat, dcb_addr, datal=[], verify=False):
         """
-        Write specifc bytes via the eth:serial adapter, and readback DCB in case it triggered a change
+        Write specifc bytes via the eth:serial adapter and apply them to the cached DCB.
+        With verify (or UH1.verify_writes) just the written range is read back to check it.
+        Writes jump the bus queue ahead of any background polling
         """
         _LOGGER.debug("[RS] async_write_bytes UH1 called")
+        return await self.bus.async_submit(PRIO_WRITE, None, self._async_write_bytes, thermo, dcb_addr, list(datal), verify)
+
+    async def _async_write_bytes(self, thermo: Thermostat, dcb_addr, datal, verify, confirm=True):
+        """
+        Bus transaction: one write frame, its ACK and optional range verification.
+        confirm has the next poll re-read the whole DCB to pick up the write
+        """
         if not await self.async_open_connection():
             _LOGGER.info("[RS] Hub offline!!!")
             return False
 
-        payload = len(datal)  # Since writing - payload is length of bytes to write
-        _LOGGER.debug("[RS] Writing {} bytes to tstatid {}: {}".format(payload, thermo._id, datal))
-        length_lo = payload
-        length_hi = 0       # since reading back less than 256 bytes
-        dcb_addr_lo = dcb_addr & BYTEMASK
-        dcb_addr_hi = (dcb_addr>>8) & BYTEMASK
-        msg = [thermo._id, 10+payload, MASTER_ADDR, WRITE, dcb_addr_lo, dcb_addr_hi, length_lo, length_hi]
-        msg=msg+datal        
-        crc = CRC16()
-        msg = msg + crc.run(msg)
-        _LOGGER.debug("[RS] Writing bytes: {}".format(msg))
-        self.writer.write(bytes(msg))   # Write payload to correct thermo
-        await self.writer.drain()
+        _LOGGER.debug("[RS] Writing %s bytes to tstatid %s: %s", len(datal), thermo._id, datal)
+        msg = write_frame(thermo._id, dcb_addr, datal)
+        _LOGGER.debug("[RS] Writing bytes: %s", msg)
+        await self._async_gap()
+        tic = time.monotonic()
+        try:
+            self.conn.send(msg)   # Write payload to correct thermo
+            self.metrics.sent(len(msg))
+        except OSError as e:
+            _LOGGER.error("[RS] Connection failed writing to thermo {}: {}".format(thermo._id, e))
+            self.conn.invalidate()
+            return False
 
         _LOGGER.debug("[RS] reading back ACK with timeout")
-        return_flag = True
-        
-        # Strat:  Read bytes until timeout as packest seem different lengths
-        # TODO: consider undersatdning more and making more robust
         try:
-            length = 0
-            response = b""
-            while True:
-                byte = await asyncio.wait_for(self.reader.readexactly(1), timeout=0.2)
-                length += 1
-                response += byte
+            async with async_timeout.timeout(thermo.timer(OP_WRITE).timeout):
+                response = await self._async_read_ack(thermo)
         except asyncio.TimeoutError:
-            _LOGGER.debug("[RS] Timeout")
-        except asyncio.IncompleteReadError as e:
-            _LOGGER.error("[RS] Connection severed mid-transmission. Got: {}".format(e.partial))
+            _LOGGER.error("[RS] No ACK from thermo {}".format(thermo._id))
+            self._note_miss(thermo, OP_WRITE)
+            self.metrics.timed_out(thermo._id, time.monotonic() - tic)
             return False
+        except OSError as e:
+            _LOGGER.error("[RS] Connection severed waiting for ACK from thermo {}: {}".format(thermo._id, e))
+            self.conn.invalidate()
+            return False
+
+        if response is None:
+            return False
+        _LOGGER.debug("[RS] Ack response = %s", response)
+        elapsed = time.monotonic() - tic
+        self._note_answer(thermo, elapsed, OP_WRITE)
+        self.metrics.answered(thermo._id, OP_WRITE, elapsed, len(response))
+        self.last_write = time.monotonic()
+        if confirm:
+            thermo.cold_due = True      # Confirm with a full read on the next poll
 
-        if length == 0:
-            _LOGGER.error("[RS] No ACK bytes detected")
+        # Write-through: patch what we wrote into the cached DCB, the next poll does the full refresh
+        span = thermo.apply_write(dcb_addr, datal)
+        if not (verify or self.verify_writes) or span is None:
+            return True
+        start, length = span
+        try:
+            response = await self._async_read(thermo, start, length, None)
+        except OSError as e:
+            _LOGGER.error("[RS] Connection failed verifying thermo {}: {}".format(thermo._id, e))
+            self.conn.invalidate()
             return False
+        if response is None:
+            return False
+        thermo.merge_dcb(*response)
+        return True
+
+    async def async_set_schedules(self, plan: dict) -> dict:
+        """
+        Bulk schedule update, plan is {thermo: {SCHED_HEAT_WEEKDAY: bytes, ...}}. Blocks a thermo
+        already holds are skipped and the rest are queued at once so they go out back to back
+        in one bus session. Returns {thermo id: {block: result}}, see Thermostat.async_set_schedules
+        """
+        thermos = list(plan)
+        results = await asyncio.gather(*(t.async_set_schedules(plan[t]) for t in thermos))
+        return {t._id: r for t, r in zip(thermos, results)}
+
+    async def async_sync_clocks(self, now=datetime.now, threshold=CLOCK_DRIFT_THRESHOLD, thermos=None) -> dict:
+        """
+        Set the clock on every thermo (or just thermos) whose cached clock is more than threshold
+        seconds away from now(), without reading anything from the bus. The writes are all queued
+        at once so they go out back to back, and now() is taken as each frame is sent.
+        Returns {thermo id: {"drift": seconds ahead of now or None, "result": ...}} where result is
+        "in_sync", "synced", "failed" or "unknown" (offline or clock not read since restart)
+        """
+        thermos = self.thermos if thermos is None else thermos
+        results = {}
+        drifted = []
+        for thermo in thermos:
+            drift = thermo.clock_drift(now())
+            if drift is None:
+                results[thermo._id] = {"drift": None, "result": "unknown"}
+            elif abs(drift) <= threshold:
+                results[thermo._id] = {"drift": drift, "result": "in_sync"}
+            else:
+                results[thermo._id] = {"drift": drift, "result": None}
+                drifted.append(thermo)
+        if drifted:
+            _LOGGER.info("[RS] Syncing clocks on thermos {}".format([t._id for t in drifted]))
+            done = await asyncio.gather(*(self.bus.async_submit(PRIO_WRITE, None, self._async_write_clock, t, now)
+                                          for t in drifted))
+            for thermo, ok in zip(drifted, done):
+                results[thermo._id]["result"] = "synced" if ok else "failed"
+        return results
+
+    async def _async_write_clock(self, thermo: Thermostat, now):
+        """Bus transaction: write now() as the thermo's day and time. Write-through restarts the cached clock so no re-read is needed"""
+        stamp = now()
+        datal = [stamp.isoweekday(), stamp.hour, stamp.minute, stamp.second]
+        return await self._async_write_bytes(thermo, DAYTIME_ADDRW, datal, False, confirm=False)
+
+class UH1Group:
+    """
+    Registry of every UH1 hub in use, for bus metrics totalled across them. Each hub has its own
+    RS-485 segment, connection and BusScheduler and is polled on its own, so there is nothing to
+    share between them on the bus
+    """
+    def __init__(self) -> None:
+        self.hubs = {}          # UH1.id -> UH1
+
+    def add(self, uh1: UH1):
+        self.hubs[uh1.id] = uh1
+
+    def remove(self, uh1: UH1):
+        self.hubs.pop(uh1.id, None)
+
+    def get_metrics(self, per_hub=True) -> dict:
+        """Totals over every hub and (optionally) each hub's own metrics"""
+        hubs = {i: u.get_metrics() for i, u in self.hubs.items()}
+        metrics = {"hubs": len(hubs)}
+        for key in ("transactions", "bytes_tx", "bytes_rx", "timeouts", "crc_errors", "reconnects", "queued"):
+            metrics[key] = sum(m[key] for m in hubs.values())
+        if per_hub:
+            metrics["per_hub"] = hubs
+        return metrics
+
+class ThermoHistory:
+    """
+    Ring buffers of one sample per poll (time, room temp, target, heat demand) held in typed
+    arrays, 12 bytes a sample so HISTORY_SIZE samples on 32 thermos is under 300KB. Recording
+    overwrites the oldest sample, the figures work on array slices of the last window
+    """
+    __slots__ = ("size", "count", "_next", "times", "temps", "targets", "heat")
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self.count = 0
+        self._next = 0
+        self.times = array("d", bytes(8 * size))    # time.monotonic()
+        self.temps = array("h", bytes(2 * size))    # Room temp in tenths of a degree
+        self.targets = array("B", bytes(size))     # Raw DCB byte, unsigned
+        self.heat = array("b", bytes(size))
+
+    def __len__(self):
+        return self.count
+
+    def append(self, at, room_temp, target, heat):
+        i = self._next
+        self.times[i] = at
+        self.temps[i] = int(round(room_temp * 10))
+        self.targets[i] = target
+        self.heat[i] = 1 if heat else 0
+        self._next = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def record(self, at, thermo: Thermostat):
+        """Sample the thermo's freshly polled snapshot"""
+        room_temp = thermo.get_room_temp()
+        if room_temp is not None:
+            self.append(at, room_temp, thermo.get_target_temp(), thermo.get_heat_status())
+
+    def _window(self, seconds):
+        """Oldest first (times, temps, heat) for the samples in the last seconds"""
+        if self.count < self.size:
+            times, temps, heat = self.times[:self.count], self.temps[:self.count], self.heat[:self.count]
         else:
-            _LOGGER.debug("[RS] Ack response = {}".format(list(response)))  
-        
-        return_flag = await self.async_read_dcb(thermo, TIMEOUT)
-        self.writer.close()
-        await self.writer.wait_closed()
-        await asyncio.sleep(0.2)
+            n = self._next
+            times = self.times[n:] + self.times[:n]
+            temps = self.temps[n:] + self.temps[:n]
+            heat = self.heat[n:] + self.heat[:n]
+        if not times:
+            return times, temps, heat
+        start = bisect.bisect_left(times, times[-1] - seconds)
+        return times[start:], temps[start:], heat[start:]
 
-        return return_flag
+    def stats(self, seconds=HISTORY_WINDOW) -> dict:
+        """
+        One pass over the last seconds of samples giving the room temp change in C per hour while
+        heating and while not, and the fraction of the time heat was demanded. Each is None until
+        HISTORY_MIN_SPAN of it has been seen
+        """
+        times, temps, heat = self._window(seconds)
+        span = [0.0, 0.0]       # Seconds not heating / heating
+        change = [0, 0]         # Room temp change in tenths not heating / heating
+        for t0, t1, c0, c1, h in zip(times, times[1:], temps, temps[1:], heat):
+            if t1 - t0 <= HISTORY_MAX_GAP:
+                span[h] += t1 - t0
+                change[h] += c1 - c0
+        rates = [change[h] / 10 / span[h] * 3600 if span[h] >= HISTORY_MIN_SPAN else None for h in (0, 1)]
+        total = span[0] + span[1]
+        return {
+            "heating_rate": rates[1],
+            "cooling_rate": rates[0],
+            "duty_cycle": span[1] / total if total >= HISTORY_MIN_SPAN else None,
+        }
+
+class DCBSnapshot:
+    """
+    Immutable view of one DCB read, decoded once when it arrives using the model's layout.
+    Thermostat swaps in a new snapshot per read so readers never see a half updated DCB
+    """
+    __slots__ = ("raw", "model", "target_temp", "away_temp", "room_temp", "heat_status",
+                 "hotwater_status", "holiday_hours", "run_mode", "day", "time",
+                 "weekday_sched", "weekend_sched", "weekday_dhw_sched", "weekend_dhw_sched")
+
+    def __init__(self, raw: bytes) -> None:
+        raw = bytes(raw)
+        model = raw[MODEL_ADDR]
+        layout = DCB_LAYOUTS.get(model, DCB_LAYOUTS[PRT])
+        t = layout["time"]
+        wd = layout["weekday"]
+        we = layout["weekend"]
+        hw = model == PRTHW
+        init = object.__setattr__
+        init(self, "raw", raw)
+        init(self, "model", model)
+        init(self, "target_temp", raw[TARGET_ADDR])
+        init(self, "away_temp", raw[AWAYTEMP_ADDR])
+        init(self, "room_temp", ((raw[ROOMTEMP_ADDR]<<8) + raw[ROOMTEMP_ADDR+1])/10)
+        init(self, "heat_status", raw[HEAT_ADDR] == 1)
+        init(self, "hotwater_status", hw and raw[layout["dhw"]] == 1)
+        init(self, "holiday_hours", (raw[HOLIDAYLEN_ADDR]<<8) + raw[HOLIDAYLEN_ADDR+1])
+        init(self, "run_mode", raw[RUNMODE_ADDR])
+        init(self, "day", raw[layout["day"]])
+        init(self, "time", raw[t]*3600 + raw[t+1]*60 + raw[t+2])
+        init(self, "weekday_sched", raw[wd : wd+HEAT_SCHED_LEN])
+        init(self, "weekend_sched", raw[we : we+HEAT_SCHED_LEN])
+        if hw:
+            wd, we = layout["weekday_dhw"], layout["weekend_dhw"]
+            init(self, "weekday_dhw_sched", raw[wd : wd+DHW_SCHED_LEN])
+            init(self, "weekend_dhw_sched", raw[we : we+DHW_SCHED_LEN])
+        else:
+            init(self, "weekday_dhw_sched", None)
+            init(self, "weekend_dhw_sched", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DCBSnapshot is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("DCBSnapshot is read-only")
+
+class WriteCoalescer:
+    """
+    Per thermostat write queue. Writes are held for WRITE_DEBOUNCE so a burst (slider drags,
+    automations setting several things) goes out together: later bytes for the same address
+    replace earlier ones and adjacent addresses are merged into a single write frame
+    """
+    def __init__(self, thermo: Thermostat) -> None:
+        self.thermo = thermo
+        self._pending = {}      # write address -> byte value
+        self._waiters = []      # (future, addresses) for each queued write
+        self._task: asyncio.Task = None     # Flush still waiting out the debounce
+        self._flushes = set()   # Every flush task not finished yet, including ones writing
+        self._deadline = 0.0
+        self._first = 0.0
+        self._lock = asyncio.Lock()
+
+    async def async_write(self, dcb_addr, datal) -> bool:
+        """Queue datal for dcb_addr and wait until it has been written (or failed)"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        addrs = range(dcb_addr, dcb_addr + len(datal))
+        for addr, value in zip(addrs, datal):
+            self._pending[addr] = value
+        future = loop.create_future()
+        self._waiters.append((future, addrs))
+        if self._task is None:
+            self._first = now
+            self._task = loop.create_task(self._async_flush())
+            self._flushes.add(self._task)
+            self._task.add_done_callback(self._flushes.discard)
+        self._deadline = min(now + WRITE_DEBOUNCE, self._first + WRITE_MAX_DELAY)
+        return await future
+
+    @staticmethod
+    def _runs(pending):
+        """Split {addr: value} into contiguous (start address, [values]) runs"""
+        runs = []
+        for addr in sorted(pending):
+            if runs and addr == runs[-1][0] + len(runs[-1][1]):
+                runs[-1][1].append(pending[addr])
+            else:
+                runs.append((addr, [pending[addr]]))
+        return runs
+
+    async def _async_flush(self):
+        loop = asyncio.get_running_loop()
+        waiters = []
+        results = {}
+        try:
+            while (delay := self._deadline - loop.time()) > 0:
+                await asyncio.sleep(delay)
+            pending, waiters = self._pending, self._waiters
+            self._pending, self._waiters, self._task = {}, [], None
+            runs = self._runs(pending)
+            _LOGGER.debug("[RS] Thermo {}: {} queued writes coalesced into {} frames".format(self.thermo._id, len(waiters), len(runs)))
+            async with self._lock:      # Keep batches for this thermo in order
+                for start, values in runs:
+                    try:
+                        ok = await self.thermo.uh1.async_write_bytes(self.thermo, start, values)
+                    except Exception as e:
+                        _LOGGER.error("[RS] Thermo {}: write at {} failed {}".format(self.thermo._id, start, e))
+                        ok = False
+                    for addr in range(start, start + len(values)):
+                        results[addr] = ok
+        finally:
+            if self._task is asyncio.current_task():
+                # Cancelled while still waiting out the debounce - nothing went out
+                waiters, self._waiters, self._pending, self._task = self._waiters, [], {}, None
+            # Always answer every caller, a cancelled (e.g. hub closing) write counts as failed
+            for future, addrs in waiters:
+                if not future.done():
+                    future.set_result(all(results.get(addr, False) for addr in addrs))
+
+    async def async_cancel(self):
+        """Drop queued writes and stop any flush in progress, e.g. when the hub closes. Callers get False"""
+        flushes = list(self._flushes)
+        for task in flushes:
+            task.cancel()
+        await asyncio.gather(*flushes, return_exceptions=True)
 
 class Thermostat():
     """Dummy thermostat (device for HA) for Hello World example."""
@@ -208,10 +1440,95 @@ class Thermostat():
         self._id = int(tstat_id)
         self.uh1 = uh1
         self.name = name
-        self.dcb = None
+        self.snapshot: DCBSnapshot = None
+        self.dcb_length = None   # Exact DCB length learnt from the last full read
         self.online = False
-        self.model = PRT
+        self.stale = False      # Snapshot was restored (e.g. across a restart) and not read since
+        self.full_read_at = 0.0     # time.monotonic() of the last full DCB read
+        self.cold_due = True        # Next poll reads the whole DCB, e.g. after a write
+        self.clock_at = None        # time.monotonic() when the snapshot's clock bytes were current
+        self.model = model
         self.fw_version = 'v6.x.y.x'
+        self.writes = WriteCoalescer(self)
+        self.history = ThermoHistory()
+        self.health = ThermoHealth()
+        self.timing = ResponseTimer()           # Full DCB reads
+        self.range_timing = ResponseTimer()     # Range reads, probes and write ACKs
+
+    def timer(self, op) -> ResponseTimer:
+        """Response timing for an OP_DCB, OP_RANGE or OP_WRITE transaction"""
+        return self.timing if op == OP_DCB else self.range_timing
+
+    @property
+    def dcb(self) -> bytes:
+        """Raw bytes of the last DCB read (None until the first read)"""
+        return None if self.snapshot is None else self.snapshot.raw
+
+    def update_dcb(self, raw) -> bool:
+        """Decode a freshly read DCB into a new snapshot"""
+        if len(raw) < DCB_MIN_LEN:
+            _LOGGER.error("[RS] Thermo {}: ignoring short DCB of {} bytes".format(self._id, len(raw)))
+            return False
+        self.snapshot = DCBSnapshot(raw)
+        self.model = self.snapshot.model
+        return True
+
+    def restore_dcb(self, raw) -> bool:
+        """Start from a DCB saved earlier, treated as online but stale until a full read replaces it"""
+        if not self.update_dcb(raw):
+            return False
+        self.stale = True
+        self.online = True
+        return True
+
+    def merge_dcb(self, dcb_addr, datal):
+        """Patch bytes read (or written) at dcb_addr into the cached DCB"""
+        raw = self.dcb
+        if raw is None:
+            return
+        end = dcb_addr + len(datal)
+        if end > len(raw):
+            _LOGGER.error("[RS] Range {}-{} outside cached DCB of {} bytes".format(dcb_addr, end, len(raw)))
+            return
+        self.update_dcb(b"".join((raw[:dcb_addr], bytes(datal), raw[end:])))
+        self._note_clock(dcb_addr, end)
+
+    def _note_clock(self, start, end):
+        """The DCB range start-end was just refreshed, restart the clock run-on if it holds the time"""
+        if start <= DCB_LAYOUTS.get(self.model, DCB_LAYOUTS[PRT])["time"] < end:
+            self.clock_at = time.monotonic()
+
+    def _clock_run_on(self) -> int:
+        """Seconds the thermo's clock has moved on since we last read it"""
+        return 0 if self.clock_at is None else int(time.monotonic() - self.clock_at)
+
+    def apply_write(self, dcb_addr, datal):
+        """
+        Patch bytes just written at write address dcb_addr into the cached DCB. Returns the
+        (read offset, length) span touched, or None if nothing known was cached to patch
+        """
+        raw = self.dcb
+        if raw is None:
+            return None
+        wmap = WRITE_TO_READ.get(self.model, WRITE_TO_READ[PRT])
+        patched = bytearray(raw)
+        touched = []
+        for waddr, value in zip(range(dcb_addr, dcb_addr + len(datal)), datal):
+            raddr = wmap.get(waddr)
+            if raddr is None or raddr >= len(patched):
+                _LOGGER.debug("[RS] Thermo {}: write address {} not cached, left to next poll".format(self._id, waddr))
+                continue
+            patched[raddr] = value
+            touched.append(raddr)
+        if not touched:
+            return None
+        self.update_dcb(bytes(patched))
+        self._note_clock(min(touched), max(touched) + 1)
+        return min(touched), max(touched) - min(touched) + 1
+
+    async def async_read_range(self, dcb_addr, length):
+        """Refresh only part of the DCB, e.g. async_read_range(ROOMTEMP_ADDR, 2)"""
+        return await self.uh1.async_read_range(self, dcb_addr, length)
 
     def get_tstat_id(self):
         return self._id
@@ -220,14 +1537,12 @@ class Thermostat():
         return self.name
 
     def get_model(self):
-        if self.online == True:
-            self.model = self.dcb[MODEL_ADDR]
         return 'PRTHW' if self.model==PRTHW else 'PRT'
 
     def get_target_temp(self):
         if self.online == False:
             return None
-        return self.dcb[TARGET_ADDR]
+        return self.snapshot.target_temp
 
     async def async_set_target_temp(self, temperature: int):
         """
@@ -239,12 +1554,12 @@ class Thermostat():
             _LOGGER.error("[RS] Refusing to set temp outside of allowed range (5-35)")
         else:
             datal = [temperature]
-            await self.uh1.async_write_bytes(self, TARGET_ADDR, datal)
+            return await self.writes.async_write(TARGET_ADDR, datal)
  
     def get_away_temp(self):
         if self.online == False:
             return None
-        return self.dcb[AWAYTEMP_ADDR]
+        return self.snapshot.away_temp
 
     async def async_set_away_temp(self, temperature):
         """
@@ -256,21 +1571,17 @@ class Thermostat():
             _LOGGER.error("[RS] Refusing to set temp outside of allowed range (7-17)")
         else:
             datal = [temperature]
-            self.uh1.async_write_bytes(self, AWAYTEMP_ADDR, datal)
+            return await self.writes.async_write(AWAYTEMP_ADDR, datal)
  
     def get_heat_status(self) -> bool:
         if self.online == False:
             return False
-        return True if self.dcb[HEAT_ADDR]==1 else False
+        return self.snapshot.heat_status
 
     def get_hotwater_status(self):
         if self.online == False:
             return False
-        if self.dcb[MODEL_ADDR] == PRTHW:
-            _LOGGER.debug("[RS] HeatmiserThermostat supports HW - read status")
-            return True if self.dcb[DHW_ADDR]==1 else False
-        else:
-            return False
+        return self.snapshot.hotwater_status
 
     async def async_set_hotwater(self, onoff):
         """
@@ -278,19 +1589,22 @@ class Thermostat():
         """
         _LOGGER.info("[RS] HeatmiserThermostat set_hotwater_state called with {}".format(onoff))
 
-        if self.dcb[MODEL_ADDR] != PRTHW:
+        if self.model != PRTHW:
             _LOGGER.error("[RS] Refusing to set hot-water as incorrect thermo model")
             return False
         else:
             datal = [onoff]
-            return await self.uh1.async_write_bytes(self, DHW_ADDRW, datal)
+            return await self.writes.async_write(DHW_ADDRW, datal)
 
     def get_holiday(self):
         if self.online == False:
             return None
-        msb = self.dcb[HOLIDAYLEN_ADDR]<<8
-        lsb = self.dcb[HOLIDAYLEN_ADDR+1]
-        return False if lsb+msb == 0 else True
+        return self.snapshot.holiday_hours != 0
+
+    def get_holiday_hours(self):
+        if self.online == False:
+            return None
+        return self.snapshot.holiday_hours
 
     async def async_set_holiday(self, hours=HOLIDAY_HOURS_MAX):
         """
@@ -301,12 +1615,12 @@ class Thermostat():
         hi = int (hours/256)
         datal = [lo, hi]
         _LOGGER.info("[RS] Setting holiday with following data bytes {}".format(datal))
-        return await self.uh1.async_write_bytes(self, HOLIDAYLEN_ADDR, datal)
+        return await self.writes.async_write(HOLIDAYLEN_ADDR, datal)
 
     def get_run_mode(self):
         if self.online == False:
             return HEAT_MODE
-        return self.dcb[RUNMODE_ADDR]
+        return self.snapshot.run_mode
 
     async def async_set_run_mode(self, heat_away):
         """
@@ -315,14 +1629,12 @@ class Thermostat():
         _LOGGER.info("[RS] HeatmiserThermostat set_run_mode called with {}".format(heat_away))
 
         datal = [heat_away]
-        await self.uh1.async_write_bytes(self._id, RUNMODE_ADDR, datal)
+        return await self.writes.async_write(RUNMODE_ADDR, datal)
         
     def get_room_temp(self):
         if self.online == False:
             return None
-        msb = self.dcb[ROOMTEMP_ADDR]<<8
-        lsb = self.dcb[ROOMTEMP_ADDR+1]
-        return ((msb+lsb)/10)
+        return self.snapshot.room_temp
 
     async def async_set_daytime(self, day, hour, mins, secs):
         """
@@ -330,7 +1642,7 @@ class Thermostat():
         """
         _LOGGER.info("[RS] HeatmiserThermostat set_daytime called with tsatid={}, DD,HH,MM,SS={},{},{},{}".format(self._id, day,hour,mins,secs))
         datal = [day, hour, mins, secs]
-        return await self.uh1.async_write_bytes(self, DAYTIME_ADDRW, datal)
+        return await self.writes.async_write(DAYTIME_ADDRW, datal)
 
     async def async_set_heat_schedule(self, weekend, sched_array):
         """
@@ -343,7 +1655,31 @@ class Thermostat():
         else:
             dcb_addr = WEEKDAY_ADDRW
         _LOGGER.info("[RS] set_heat_schedule called with tsatid={}, DCB={}, {}".format(self._id, dcb_addr, sched_array))
-        return await self.uh1.async_write_bytes(self, dcb_addr, sched_array)
+        return await self.writes.async_write(dcb_addr, sched_array)
+
+    async def async_set_schedules(self, schedules: dict) -> dict:
+        """
+        Write the schedule blocks in schedules ({SCHED_HEAT_WEEKDAY: bytes, ...}) that differ from the
+        cached DCB. They are queued together so the write coalescer sends adjacent blocks as one frame.
+        Returns {block: "unchanged", "written", "failed" or "unsupported"}
+        """
+        results = {}
+        pending = {}
+        for block, sched in schedules.items():
+            dcb_addr, dhw, weekend = SCHEDULE_BLOCKS[block]
+            if dhw and self.model != PRTHW:
+                results[block] = "unsupported"
+                continue
+            current = self.get_dhw_schedule(weekend) if dhw else self.get_heat_schedule(weekend)
+            if current == list(sched) and not self.stale:
+                results[block] = "unchanged"
+                continue
+            pending[block] = self.writes.async_write(dcb_addr, list(sched))
+        if pending:
+            _LOGGER.info("[RS] Thermo {}: writing schedules {}".format(self._id, list(pending)))
+            done = await asyncio.gather(*pending.values())
+            results.update({block: "written" if ok else "failed" for block, ok in zip(pending, done)})
+        return results
 
     async def async_set_dhw_schedule(self, weekend:bool, sched_array:list[int]):
         """
@@ -355,97 +1691,150 @@ class Thermostat():
         else:
             dcb_addr = WEEKDAY_DHW_ADDRW
         _LOGGER.info("[RS] set_dhw_schedule called with tsatid={}, DCB={}, {}".format(self._id, dcb_addr, sched_array))
-        return await self.uh1.async_write_bytes(self, dcb_addr, sched_array)
+        return await self.writes.async_write(dcb_addr, sched_array)
 
     def get_day(self):
+        """Day of the week (1=Mon), rolled on with the clock since it was last read"""
         if self.online == False:
             return None
-        if self.get_model() == 'PRTHW':
-            return self.dcb[DAY_ADDR+1]
-        else:
-            return self.dcb[DAY_ADDR]
+        day = self.snapshot.day
+        if not 1 <= day <= 7:
+            return day
+        return (day - 1 + (self.snapshot.time + self._clock_run_on()) // 86400) % 7 + 1
 
     def get_time(self):
+        """Seconds since midnight on the thermo's clock - run on from the last read, not re-read every poll"""
         if self.online == False:
             return None
-        if self.get_model() == 'PRTHW':
-            i=TIME_ADDR+1
-        else:
-            i=TIME_ADDR
-        time = self.dcb[i]*3600 
-        time+= self.dcb[i+1]*60
-        time+= self.dcb[i+2]
-        return time
+        return (self.snapshot.time + self._clock_run_on()) % 86400
+
+    def clock_drift(self, now: datetime):
+        """
+        Seconds the thermo's clock is ahead of now (negative if behind), worked out from the
+        cached clock. None while offline, stale or before the clock has been read
+        """
+        if self.online == False or self.stale or self.clock_at is None:
+            return None
+        day = self.snapshot.day
+        if not 1 <= day <= 7:
+            return None
+        # Sub-second run on and host time so the drift holds steady between clock reads
+        thermo = (day - 1) * 86400 + self.snapshot.time + time.monotonic() - self.clock_at
+        host = (now.isoweekday() - 1) * 86400 + now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+        drift = round(thermo - host) % WEEK_SECS
+        return drift - WEEK_SECS if drift > WEEK_SECS // 2 else drift
 
     def get_heat_schedule(self, weekend):
         if self.online == False:
             return None
-        if (weekend == True):
-            dcb_addr = WEEKEND_ADDR
-        else:
-            dcb_addr = WEEKDAY_ADDR
-        if self.get_model() == 'PRTHW':
-            dcb_addr += 1
-        data_array = self.dcb[dcb_addr : dcb_addr+12] #read 12 bytes
-        return data_array
+        sched = self.snapshot.weekend_sched if weekend == True else self.snapshot.weekday_sched
+        return list(sched)
 
     def get_dhw_schedule(self, weekend):
         if self.online == False:
             return None
-        if self.get_model() == 'PRTHW':
-            _LOGGER.debug("[RS] HeatmiserThermostat support HW - read status")
-            if (weekend == True):
-                dcb_addr = WEEKEND_DHW_ADDR
-            else:
-                dcb_addr = WEEKDAY_DHW_ADDR
-            data_array = self.dcb[dcb_addr : dcb_addr+16]   #read 16 bytes for 4 on/offs
-            return data_array
+        if self.model == PRTHW:
+            sched = self.snapshot.weekend_dhw_sched if weekend == True else self.snapshot.weekday_dhw_sched
+            return list(sched)
         else:
             _LOGGER.error("[RS] Trying to get DHW schedule from non PRTHW model")
             return False
 
-# Believe this is known as CCITT (0xFFFF)
-# This is the CRC function converted directly from the Heatmiser C code
-# provided in their API
+# CRC-16/CCITT (poly 0x1021, initial value 0xFFFF, no reflection). Originally converted
+# nibble by nibble from the Heatmiser C code in their API, now done a byte at a time
+# from a 256 entry table - results are bit-identical
+CRC16_POLY = 0x1021
+CRC16_INIT = 0xffff
+
+def _crc16_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = (crc << 1) ^ CRC16_POLY if crc & 0x8000 else crc << 1
+        table.append(crc & 0xffff)
+    return tuple(table)
+
 class CRC16:
     """This is the CRC hashing mechanism used by the V3 protocol."""
-    LookupHigh = [
-        0x00, 0x10, 0x20, 0x30, 0x40, 0x50, 0x60, 0x70,
-        0x81, 0x91, 0xa1, 0xb1, 0xc1, 0xd1, 0xe1, 0xf1
-    ]
-    LookupLow = [
-        0x00, 0x21, 0x42, 0x63, 0x84, 0xa5, 0xc6, 0xe7,
-        0x08, 0x29, 0x4a, 0x6b, 0x8c, 0xad, 0xce, 0xef
-    ]
+    Table = _crc16_table()
 
     def __init__(self):
         self.high = BYTEMASK
         self.low = BYTEMASK
 
-    def extract_bits(self, val):
-        """Extras the 4 bits, XORS the message data, and does table lookups."""
-        # Step one, extract the Most significant 4 bits of the CRC register
-        thisval = self.high >> 4
-        # XOR in the Message Data into the extracted bits
-        thisval = thisval ^ val
-        # Shift the CRC Register left 4 bits
-        self.high = (self.high << 4) | (self.low >> 4)
-        self.high = self.high & BYTEMASK    # force char
-        self.low = self.low << 4
-        self.low = self.low & BYTEMASK      # force char
-        # Do the table lookups and XOR the result into the CRC tables
-        self.high = self.high ^ self.LookupHigh[thisval]
-        self.high = self.high & BYTEMASK    # force char
-        self.low = self.low ^ self.LookupLow[thisval]
-        self.low = self.low & BYTEMASK      # force char
+    @staticmethod
+    def compute(data, crc=CRC16_INIT) -> int:
+        """
+        CRC of bytes/bytearray/memoryview/list of ints, pass a previous result as crc
+        to carry on over a frame that arrived in pieces (e.g. header then DCB)
+        """
+        table = CRC16.Table
+        for value in data:
+            crc = ((crc << 8) & 0xff00) ^ table[(crc >> 8) ^ value]
+        return crc
+
+    @staticmethod
+    def verify(frame) -> bool:
+        """True if the last two bytes of frame (lo, hi) are the CRC of the rest"""
+        if len(frame) < 3:
+            return False
+        return CRC16.compute(frame[:-2]) == (frame[-2] | (frame[-1]<<8))
+
+    @staticmethod
+    def verify_all(frames) -> list[bool]:
+        """Batch version of verify, e.g. every DCB frame received in a poll"""
+        verify = CRC16.verify
+        return [verify(frame) for frame in frames]
 
     def update(self, val):
-        """Updates the CRC value using bitwise operations."""
-        self.extract_bits(val >> 4)    # High nibble first
-        self.extract_bits(val & 0x0f)   # Low nibble
+        """Updates the CRC value with one byte"""
+        crc = self.compute((val,), (self.high<<8) | self.low)
+        self.high = crc >> 8
+        self.low = crc & BYTEMASK
 
     def run(self, message):
-        """Calculates a CRC"""
-        for value in message:
-            self.update(value)
-        return [self.low, self.high]
\ No newline at end of file
+        """Calculates a CRC and returns it as [lo, hi] ready to append to a frame"""
+        crc = self.compute(message, (self.high<<8) | self.low)
+        self.high = crc >> 8
+        self.low = crc & BYTEMASK
+        return [self.low, self.high]
+
+def heat_schedule(periods) -> list[int]:
+    """DCB bytes for up to 4 heating periods of (hour, mins, temp), the rest marked unused"""
+    sched = [b for period in periods for b in period]
+    return sched + HEAT_PERIOD_UNUSED * (4 - len(periods))
+
+def dhw_schedule(periods) -> list[int]:
+    """DCB bytes for up to 4 hot water periods of (on hour, on mins, off hour, off mins), the rest unused"""
+    sched = [b for period in periods for b in period]
+    return sched + DHW_PERIOD_UNUSED * (4 - len(periods))
+
+def _append_crc(msg: bytearray) -> bytearray:
+    """Add the CRC of msg (lo, hi) to its end"""
+    crc = CRC16.compute(msg)
+    msg.append(crc & BYTEMASK)
+    msg.append(crc >> 8)
+    return msg
+
+@functools.lru_cache(maxsize=256)
+def read_frame(tstat_id, dcb_addr, length) -> bytes:
+    """
+    V3 read request for length bytes from dcb_addr (DCB_LEN_FULL for the whole DCB). A poll asks
+    each thermo the same few questions, so the finished frames (CRC and all) are cached
+    """
+    payload = 0  # Since reading - payload is zero
+    msg = bytearray((tstat_id, 10+payload, MASTER_ADDR, READ, dcb_addr & BYTEMASK, (dcb_addr>>8) & BYTEMASK,
+                     length & BYTEMASK, (length>>8) & BYTEMASK))
+    return bytes(_append_crc(msg))
+
+def write_frame(tstat_id, dcb_addr, datal) -> bytearray:
+    """
+    V3 write request putting the bytes in datal at write address dcb_addr, built in place in one
+    buffer. A fresh buffer per frame as the transport may hold on to it until it has been sent
+    """
+    payload = len(datal)  # Since writing - payload is length of bytes to write
+    # Length hi is 0 since never writing 256 bytes or more
+    msg = bytearray((tstat_id, 10+payload, MASTER_ADDR, WRITE, dcb_addr & BYTEMASK, (dcb_addr>>8) & BYTEMASK, payload, 0))
+    msg += bytes(datal)
+    return _append_crc(msg)
@@ -27,6 +27,9 @@ delay=None
 # Set-up port connection to heatmiser system
 uh1 = heatmiser.UH1("socket://" + IP_ADDRESS + ":" + PORT)
 loop = asyncio.new_event_loop()
+tic = time.perf_counter()
+print("Discovered: ", loop.run_until_complete(uh1.async_discover()))
+print(f"Discovery took: {time.perf_counter() - tic:0.4f} seconds")
 #if not loop.run_until_complete(uh1.async_open_connection()):
 #    print("Connection failed...  do retry action")
 #    exit(1)
@@ -69,18 +72,9 @@ while(True):
             key = input("[1] datetime, [2] holhours min, [3] holhours max, [4] DHW sched, [5] Heat sched")
             
             if(key == '1'):
-                """ Update datetime """
-                async def async_write_thermo(t: heatmiser.Thermostat):
-                    print ("===",t.get_name(),"===")
-                    time2set=time.localtime()
-                    day=time2set.tm_wday+1
-                    hour=time2set.tm_hour
-                    mins=time2set.tm_min
-                    secs=time2set.tm_sec
-                    print("Day:{}, Hour:{}, Mins:{}, Secs:{}".format(day,hour,mins,secs))
-                    await t.async_set_daytime(day, hour, mins, secs)
-                for t in uh1.thermos:
-                    loop.run_until_complete(async_write_thermo(t))
+                """ Update datetime on the thermos that have drifted """
+                for tstat_id, result in loop.run_until_complete(uh1.async_sync_clocks()).items():
+                    print("Thermo {}: drift {}s, {}".format(tstat_id, result["drift"], result["result"]))
 
             elif(key == '2'):
                 """ Update to set to 0 holiday hours (i.e. home)"""
@@ -88,7 +82,7 @@ while(True):
                     print ("===",t.get_name(),"===")
                     await t.async_set_holiday(0)            
                 for t in uh1.thermos:
-                    asyncio.run(async_write_thermo(t))
+                    loop.run_until_complete(async_write_thermo(t))
 
             elif(key == '3'):
                 """ Update to set to max holiday hours (i.e. away)"""
@@ -96,7 +90,7 @@ while(True):
                     print ("===",t.get_name(),"===")
                     await t.async_set_holiday(1008)
                 for t in uh1.thermos:
-                    asyncio.run(async_write_thermo(t))
+                    loop.run_until_complete(async_write_thermo(t))
 
             elif(key == '4'):
                 """ Update to set DHW schedule to Tstat 1 only"""
@@ -106,7 +100,7 @@ while(True):
                     print("Array: {}".format(sched_array))
                     await t.async_set_dhw_schedule(True, sched_array)
                     await t.async_set_dhw_schedule(False, sched_array)
-                asyncio.run(async_write_thermo(uh1.thermos[0]))
+                loop.run_until_complete(async_write_thermo(uh1.thermos[0]))
 
             elif(key == '5'):
                 """ Update to set heat schedule to all Tstats"""
@@ -117,7 +111,7 @@ while(True):
                     await t.async_set_heat_schedule(True, sched_array)
                     await t.async_set_heat_schedule(False, sched_array)
                 for t in uh1.thermos:
-                    asyncio.run(async_write_thermo(t))
+                    loop.run_until_complete(async_write_thermo(t))
         
         elif(key == 't'):
             key = input("Enter thrash period in seconds...")
@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+"""
+ Micro-benchmarks for the CPU hot paths of heatmiserRS - CRC, frame building, DCB parsing,
+ the Thermostat getters and the climate coordinator update (with a stub hass, only if
+ homeassistant is installed). Reports ops/sec, the most memory one op has live at once
+ over what was live before it (peak B/op, the garbage a poll makes) and what each op leaves
+ allocated on average (net B/op, caches or leaks), e.g.
+
+    python3 heatmiserRS_bench.py --save         # store a baseline for this machine
+    python3 heatmiserRS_bench.py --compare      # rerun and show the change against it
+"""
+import heatmiserRS as heatmiser
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "heatmiserRS_bench_baseline.json")
+MIN_RUN_TIME = 0.2      # Seconds each timed repeat should last at least
+REPEATS = 5
+DCB_FRAME_SIZES = [64, 97, 300]     # PRT, PRTHW and the longest 7 day DCBs
+
+
+def sample_dcb(model, length):
+    """A plausible DCB of the given length, same layout as the simulator"""
+    dcb = bytearray(length)
+    dcb[0], dcb[1] = length >> 8, length & heatmiser.BYTEMASK
+    dcb[heatmiser.MODEL_ADDR] = model
+    dcb[heatmiser.TARGET_ADDR] = 20
+    dcb[heatmiser.ROOMTEMP_ADDR+1] = 195
+    dcb[heatmiser.HEAT_ADDR] = 1
+    return bytes(dcb)
+
+
+def response_frame(tstat_id, dcb):
+    frame_len = 9 + len(dcb) + 2
+    msg = bytearray([heatmiser.MASTER_ADDR, frame_len & 0xff, frame_len >> 8, tstat_id, heatmiser.READ,
+                     0, 0, len(dcb) & 0xff, len(dcb) >> 8]) + dcb
+    return bytes(msg + bytes(heatmiser.CRC16().run(msg)))
+
+
+def online_thermo(model=heatmiser.PRTHW, length=97):
+    thermo = heatmiser.Thermostat(None, "1", "Bench", model)
+    thermo.update_dcb(sample_dcb(model, length))
+    thermo.online = True
+    return thermo
+
+
+def benchmarks():
+    """name -> zero argument callable"""
+    cases = {}
+    request = list(heatmiser.read_frame(1, 0, heatmiser.DCB_LEN_FULL)[:-2])
+    cases["crc16_run_request"] = lambda: heatmiser.CRC16().run(request)
+    for size in DCB_FRAME_SIZES:
+        frame = response_frame(1, sample_dcb(heatmiser.PRTHW, size))
+        cases["crc16_run_dcb_{}".format(size)] = (lambda f: lambda: heatmiser.CRC16().run(f[:-2]))(frame)
+        cases["crc16_verify_dcb_{}".format(size)] = (lambda f: lambda: heatmiser.CRC16.verify(f))(frame)
+
+    cases["read_frame"] = lambda: heatmiser.read_frame(3, 0, 97)
+    schedule = [7, 0, 21, 9, 0, 16, 16, 0, 21, 22, 0, 16]
+    cases["write_frame_1"] = lambda: heatmiser.write_frame(3, heatmiser.TARGET_ADDR, [21])
+    cases["write_frame_12"] = lambda: heatmiser.write_frame(3, heatmiser.WEEKDAY_ADDRW, schedule)
+
+    for model, size in ((heatmiser.PRT, 64), (heatmiser.PRTHW, 97)):
+        thermo = online_thermo(model, size)
+        frame = response_frame(1, sample_dcb(model, size))
+        def parse(thermo=thermo, frame=frame):
+            if heatmiser.CRC16.verify(frame):
+                thermo.update_dcb(frame[9:-2])
+        cases["dcb_parse_{}".format(thermo.get_model())] = parse
+
+        decoder = heatmiser.FrameDecoder()
+        def decode(thermo=thermo, frame=frame, decoder=decoder):
+            # Bytes off the wire to a new snapshot, the way a poll's DCB read sees them
+            (received, crc_ok), = decoder.feed(frame)
+            thermo.update_dcb(received[9:-2])
+        cases["frame_decode_{}".format(thermo.get_model())] = decode
+
+    thermo = online_thermo()
+    hot = bytes(heatmiser.TIER_RANGES[heatmiser.PRTHW][heatmiser.TIER_HOT][1])
+    cases["dcb_merge_hot"] = lambda: thermo.merge_dcb(heatmiser.ROOMTEMP_ADDR, hot)
+
+    thermo = online_thermo()
+    for name in sorted(dir(thermo)):
+        if not name.startswith("get_"):
+            continue
+        getter = getattr(thermo, name)
+        if name in ("get_heat_schedule", "get_dhw_schedule"):
+            cases[name] = (lambda g: lambda: g(False))(getter)
+        else:
+            cases[name] = getter
+
+    update = climate_update()
+    if update is not None:
+        cases["climate_handle_coordinator_update"] = update
+    return cases
+
+
+def climate_update():
+    """A poll's DCB decode plus HMThermostat._handle_coordinator_update on a stub hass, None without homeassistant"""
+    try:
+        importlib.import_module("homeassistant")
+    except ImportError:
+        print("homeassistant not installed - skipping climate benchmark")
+        return None
+    # climate.py uses package relative imports, so load this directory as the package
+    name = "heatmiser_rs"
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, "__init__.py"),
+                                                      submodule_search_locations=[HERE])
+        sys.modules[name] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules[name])
+    climate = importlib.import_module(name + ".climate")
+    hm = importlib.import_module(name + ".heatmiserRS")
+
+    class StubCoordinator:
+        last_update_success = True
+        temp_deadband = 0.2
+        hub_id = "bench"
+
+        def thermo_key(self, thermo):
+            return "bench_{}".format(thermo._id)
+
+    class StubHass:
+        pass
+
+    dcb = sample_dcb(hm.PRTHW, 97)
+    thermo = hm.Thermostat(None, "1", "Bench", hm.PRTHW)
+    thermo.update_dcb(dcb)
+    thermo.online = True
+    entity = climate.HMThermostat(StubCoordinator(), thermo)
+    entity.hass = StubHass()
+    entity.async_write_ha_state = lambda: None     # No state machine behind the stub hass
+
+    def update():
+        # Every poll decodes a fresh (here unchanged) DCB before the entities hear about it
+        thermo.update_dcb(dcb)
+        entity._handle_coordinator_update()
+    return update
+
+
+def _allocations(func, runs=1000):
+    """(peak, net) bytes per op - the highest peak over live memory of any single run, and the live memory runs add on average"""
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    for _ in range(runs):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    net = (tracemalloc.get_traced_memory()[0] - start) / runs
+    tracemalloc.stop()
+    return peak, net
+
+
+def measure(func, overhead=0):
+    """(ops/sec, peak bytes per op, net bytes per op) - best of REPEATS auto-ranged runs"""
+    number = 1
+    while True:
+        tic = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - tic
+        if elapsed >= MIN_RUN_TIME:
+            break
+        number *= 10 if elapsed < MIN_RUN_TIME / 10 else 2
+    best = elapsed
+    for _ in range(REPEATS - 1):
+        tic = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - tic)
+
+    # Peak is measured per run, less what the harness itself allocates calling an empty function
+    peak, net = _allocations(func)
+    return number / best, max(peak - overhead, 0), net
+
+
+def main():
+    parser = argparse.ArgumentParser(description="heatmiserRS micro-benchmarks")
+    parser.add_argument("--filter", default="", help="only run benchmarks containing this text")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="show the change against the baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    overhead = _allocations(lambda: None)[0]
+    results = {}
+    print("{:<36} {:>14} {:>12} {:>10} {:>9}".format("benchmark", "ops/sec", "peak B/op", "net B/op", "change"))
+    for name, func in benchmarks().items():
+        if args.filter not in name:
+            continue
+        ops, peak, net = measure(func, overhead)
+        results[name] = {"ops_per_sec": ops, "peak_bytes_per_op": peak, "net_bytes_per_op": net}
+        change = ""
+        if name in baseline:
+            change = "{:+.1f}%".format((ops / baseline[name]["ops_per_sec"] - 1) * 100)
+        print("{:<36} {:>14,.0f} {:>12,} {:>10,.1f} {:>9}".format(name, ops, peak, net, change))
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("Baseline saved to {}".format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
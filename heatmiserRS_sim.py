@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+"""
+ Simulates a UH1 eth:serial bridge with Heatmiser V3 thermostats behind it so the
+ library can be benchmarked and regression tested without the real kit, e.g.
+
+    python3 heatmiserRS_sim.py --port 5000 --latency 0.05 --jitter 0.02 --offline 4
+    uh1 = heatmiser.UH1("socket://127.0.0.1:5000")
+
+ Each simulated PRT/PRTHW keeps its own DCB, answers reads (full or range) and writes
+ with a correct CRC16 and applies writes to its state. Latency, jitter, dropped and
+ corrupted frames, line noise, RS-485 echo and offline thermos can all be configured
+"""
+import heatmiserRS as heatmiser
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+DCB_LENGTHS = {heatmiser.PRT: 64, heatmiser.PRTHW: 97}     # Simulated, long enough for every field we decode
+DEFAULT_TOPOLOGY = [(1, heatmiser.PRTHW), (2, heatmiser.PRT), (3, heatmiser.PRT), (4, heatmiser.PRT), (5, heatmiser.PRT)]
+HEAT_SCHED = [7, 0, 21, 9, 0, 16, 16, 0, 21, 22, 0, 16]
+DHW_SCHED = [4, 0, 4, 30, 7, 0, 8, 0, 13, 0, 13, 30, 19, 0, 20, 0]
+TICK = 1.0      # Seconds between updates of the simulated rooms and clocks
+
+
+class SimThermostat:
+    """One simulated thermo and its DCB"""
+    def __init__(self, tstat_id: int, model: int = heatmiser.PRT, room_temp: float = 19.0, target: int = 20) -> None:
+        self.id = tstat_id
+        self.model = model
+        self.online = True
+        self.reads = 0
+        self.writes = 0
+        length = DCB_LENGTHS[model]
+        layout = heatmiser.DCB_LAYOUTS[model]
+        dcb = bytearray(length)
+        dcb[0], dcb[1] = length >> 8, length & heatmiser.BYTEMASK
+        dcb[heatmiser.MODEL_ADDR] = model
+        dcb[heatmiser.AWAYTEMP_ADDR] = 12
+        dcb[heatmiser.TARGET_ADDR] = target
+        dcb[layout["weekday"]:layout["weekday"]+heatmiser.HEAT_SCHED_LEN] = bytes(HEAT_SCHED)
+        dcb[layout["weekend"]:layout["weekend"]+heatmiser.HEAT_SCHED_LEN] = bytes(HEAT_SCHED)
+        if model == heatmiser.PRTHW:
+            dcb[layout["weekday_dhw"]:layout["weekday_dhw"]+heatmiser.DHW_SCHED_LEN] = bytes(DHW_SCHED)
+            dcb[layout["weekend_dhw"]:layout["weekend_dhw"]+heatmiser.DHW_SCHED_LEN] = bytes(DHW_SCHED)
+        self.dcb = dcb
+        self.room_temp = room_temp
+        self.set_clock(time.localtime())
+        self._update_room()
+
+    def set_clock(self, now: time.struct_time):
+        at = heatmiser.DCB_LAYOUTS[self.model]["day"]
+        self.dcb[at:at+4] = bytes([now.tm_wday+1, now.tm_hour, now.tm_min, now.tm_sec])
+
+    def _update_room(self):
+        tenths = int(round(self.room_temp * 10))
+        self.dcb[heatmiser.ROOMTEMP_ADDR] = tenths >> 8
+        self.dcb[heatmiser.ROOMTEMP_ADDR+1] = tenths & heatmiser.BYTEMASK
+        self.dcb[heatmiser.HEAT_ADDR] = 1 if self.room_temp < self.dcb[heatmiser.TARGET_ADDR] - 0.5 else 0
+
+    def tick(self, seconds: float):
+        """Crude room model - warms while calling for heat, cools slowly otherwise, clock runs on"""
+        self.room_temp += (0.01 if self.dcb[heatmiser.HEAT_ADDR] else -0.005) * seconds
+        self._update_room()
+        at = heatmiser.DCB_LAYOUTS[self.model]["time"]
+        secs = (self.dcb[at]*3600 + self.dcb[at+1]*60 + self.dcb[at+2] + int(seconds)) % 86400
+        self.dcb[at:at+3] = bytes([secs // 3600, secs // 60 % 60, secs % 60])
+
+    def read(self, start: int, length: int) -> tuple[int, bytes]:
+        self.reads += 1
+        if length == heatmiser.DCB_LEN_FULL:
+            return 0, bytes(self.dcb)
+        return start, bytes(self.dcb[start:start+length])
+
+    def write(self, start: int, data: bytes):
+        """Apply a write the way the thermo would - write addresses land at their DCB read offsets"""
+        self.writes += 1
+        wmap = heatmiser.WRITE_TO_READ[self.model]
+        for waddr, value in zip(range(start, start+len(data)), data):
+            raddr = wmap.get(waddr)
+            if raddr is not None and raddr < len(self.dcb):
+                self.dcb[raddr] = value
+        self._update_room()
+
+
+class Simulator:
+    """asyncio TCP server speaking Heatmiser V3 the way a UH1 behind an eth:serial bridge does"""
+    def __init__(self, thermos=None, latency=0.0, jitter=0.0, drop_rate=0.0, corrupt_rate=0.0, baud=0, seed=None,
+                 noise_rate=0.0, echo=False) -> None:
+        topology = DEFAULT_TOPOLOGY if thermos is None else thermos
+        self.thermos = {t.id: t for t in (SimThermostat(i, m) for i, m in topology)}
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.baud = baud        # 0 = no wire time, else ~10 bits per byte at this rate
+        self.noise_rate = noise_rate    # Fraction of responses preceded by a few garbage bytes
+        self.echo = echo        # Send every request back first, like a bridge that hears itself
+        self.frames = 0
+        self.dropped = 0
+        self.corrupted = 0
+        self.noisy = 0
+        self._random = random.Random(seed)
+        self._server: asyncio.AbstractServer = None
+        self._ticker: asyncio.Task = None
+        self.host = None
+        self.port = None
+
+    @property
+    def url(self) -> str:
+        return "socket://{}:{}".format(self.host, self.port)
+
+    def set_online(self, tstat_id: int, online: bool):
+        self.thermos[tstat_id].online = online
+
+    async def async_start(self, host="127.0.0.1", port=0) -> str:
+        self._server = await asyncio.start_server(self._async_handle, host, port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        self._ticker = asyncio.get_running_loop().create_task(self._async_tick())
+        _LOGGER.info("Simulating {} thermos on {}".format(len(self.thermos), self.url))
+        return self.url
+
+    async def async_stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _async_tick(self):
+        while True:
+            await asyncio.sleep(TICK)
+            for t in self.thermos.values():
+                t.tick(TICK)
+
+    async def _async_handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                prefix = await reader.readexactly(2)
+                frame = prefix + await reader.readexactly(prefix[1] - 2)
+                if self.echo:
+                    writer.write(frame)
+                response = self.respond(frame)
+                if response is None:
+                    continue
+                if self._random.random() < self.noise_rate:
+                    self.noisy += 1
+                    response = self._random.randbytes(self._random.randint(1, 8)) + response
+                await self._async_delay(len(frame) + len(response))
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _async_delay(self, nbytes: int):
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if self.baud:
+            delay += nbytes * 10 / self.baud
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def respond(self, frame: bytes):
+        """Response bytes for one request frame, or None when the thermo stays silent"""
+        self.frames += 1
+        if len(frame) < 10 or not heatmiser.CRC16.verify(frame):
+            _LOGGER.debug("Bad request frame {}".format(list(frame)))
+            return None
+        thermo = self.thermos.get(frame[0])
+        if thermo is None or not thermo.online:
+            return None
+        if self._random.random() < self.drop_rate:
+            self.dropped += 1
+            return None
+        start = frame[4] | (frame[5] << 8)
+        length = frame[6] | (frame[7] << 8)
+        if frame[3] == heatmiser.WRITE:
+            thermo.write(start, frame[8:-2])
+            msg = [heatmiser.MASTER_ADDR, heatmiser.ACK_LEN, 0, thermo.id, heatmiser.WRITE]
+        else:
+            start, data = thermo.read(start, length)
+            frame_len = 9 + len(data) + 2
+            msg = [heatmiser.MASTER_ADDR, frame_len & heatmiser.BYTEMASK, frame_len >> 8, thermo.id, heatmiser.READ,
+                   start & heatmiser.BYTEMASK, start >> 8, len(data) & heatmiser.BYTEMASK, len(data) >> 8]
+            msg += data
+        response = bytearray(msg)
+        response += bytes(heatmiser.CRC16().run(response))
+        if self._random.random() < self.corrupt_rate:
+            self.corrupted += 1
+            response[self._random.randrange(len(response))] ^= 0x55
+        return bytes(response)
+
+
+def _parse_topology(text: str):
+    """'1:PRTHW,2:PRT,3' -> [(1, PRTHW), (2, PRT), (3, PRT)]"""
+    models = {"PRT": heatmiser.PRT, "PRTHW": heatmiser.PRTHW}
+    topology = []
+    for item in text.split(","):
+        tid, _, model = item.partition(":")
+        topology.append((int(tid), models[model.upper() or "PRT"]))
+    return topology
+
+
+async def _async_main(args):
+    sim = Simulator(_parse_topology(args.thermos), args.latency, args.jitter, args.drop, args.corrupt, args.baud, args.seed,
+                    args.noise, args.echo)
+    for tid in args.offline:
+        sim.set_online(tid, False)
+    await sim.async_start(args.host, args.port)
+    print("Serving {} - Ctrl-C to stop".format(sim.url))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await sim.async_stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Heatmiser V3 / UH1 bridge simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--thermos", default="1:PRTHW,2:PRT,3:PRT,4:PRT,5:PRT", help="id:model list")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds, random")
+    parser.add_argument("--drop", type=float, default=0.0, help="fraction of requests left unanswered")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="fraction of responses with a flipped byte")
+    parser.add_argument("--noise", type=float, default=0.0, help="fraction of responses with garbage bytes in front")
+    parser.add_argument("--echo", action="store_true", help="echo every request back like an RS-485 adapter that hears itself")
+    parser.add_argument("--baud", type=int, default=0, help="emulate RS-485 wire time at this rate (0 = off)")
+    parser.add_argument("--offline", type=int, nargs="*", default=[], help="thermo ids that never answer")
+    parser.add_argument("--seed", type=int, default=None)
+    logging.basicConfig(format='%(asctime)s %(levelname)-8s %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(_async_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,131 +1,232 @@
 """
-Adds Support for Senors with Heatmiser Thermostat
-
-Placeholder
-
-Author: me
+Sensor platform for heatmiser_rs
 
+Room temperature, holiday hours left and clock offset for each thermo, read from the DCB
+snapshot the coordinator already polls. Plus bus health diagnostics from UH1.metrics - one
+set for the UH1 bridge and a response time and timeout count per thermo, disabled by default.
+None of them cost any extra RS-485 traffic
 """
+from __future__ import annotations
 
-from datetime import timedelta
-import async_timeout
-
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from homeassistant.helpers.entity import Entity
-
-from homeassistant.components.sensor import SensorDeviceClass, SensorEntity
-from homeassistant.const import (
-    PERCENTAGE,
-    PRESSURE_BAR,
-    TEMP_CELSIUS,
-    TEMP_FAHRENHEIT,
-    TIME_HOURS,
-    ELECTRIC_CURRENT_MILLIAMPERE,
-    ELECTRIC_POTENTIAL_VOLT,
-)
-
-DOMAIN = "atagone"
-DEFAULT_NAME = "Atag One"
-
-MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=60)
-
-SENSOR_TYPES = {
-    "dhw_temp_setp": ["DHW Temp Setpoint", "°C", "mdi:thermometer"],
-    "dhw_status": ["DHW Status", "", "mdi:water-boiler"],
-    "dhw_mode": ["DHW Mode", "", "mdi:water-boiler"],
-    "dhw_mode_temp": ["DHW Mode Temp", "°C", "mdi:thermometer"],
-}
-
-async def async_setup_entry(hass, config_entry, async_add_entities):
-    """Initialize sensor platform from config entry."""
-    coordinator = hass.data[DOMAIN][config_entry.entry_id]
-    async_add_entities([HeatmsierSensor(coordinator, sensor) for sensor in SENSOR_TYPES])
-
-class HeatmiserSensor(Entity):
-    """Representation of a Heatmiser Sensor."""
-
-    def __init__(self, coordinator, sensor):
-        """Initialize the sensor."""
-
-        self.coordinator = coordinator
-        self.type = sensor
-        self._sensor_prefix = DEFAULT_NAME
-        self._entity_type = SENSOR_TYPES[self.type][0]
-        self._name = "{} {}".format(self._sensor_prefix, SENSOR_TYPES[self.type][0])
-        self._unit = SENSOR_TYPES[self.type][1]
-        self._icon = SENSOR_TYPES[self.type][2]
-
-    def boiler_status(self, state):
-        """boiler status conversions"""
-        state = state & 14
-        if state == 8:
-            self._unit = "Boiler"
-            self._icon = "mdi:water-boiler"
-        elif state == 10:
-            self._unit = "Central"
-            self._icon = "mdi:fire"
-        elif state == 12:
-            self._unit = "Water"
-            self._icon = "mdi:fire"
-        else:
-            self._unit = "Idle"
-            self._icon = "mdi:flash"
-
-        return state
-
-    @property
-    def should_poll(self):
-        """No need to poll. Coordinator notifies entity of updates."""
-        return False
-
-    @property
-    def available(self):
-        """Return if entity is available."""
-        return self.coordinator.last_update_success
-
-    async def async_added_to_hass(self):
-        """When entity is added to hass."""
-        self.coordinator.async_add_listener(self.async_write_ha_state)
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
 
-    async def async_will_remove_from_hass(self):
-        """When entity will be removed from hass."""
-        self.coordinator.async_remove_listener(self.async_write_ha_state)
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfInformation, UnitOfTemperature, UnitOfTime
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
+
+from .heatmiserRS import UH1, Thermostat, OP_DCB, OP_RANGE, OP_WRITE
+from .const import DOMAIN
+from .coordinator import HMCoordinator
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, kw_only=True)
+class HMBusSensorDescription(SensorEntityDescription):
+    """Bus sensor whose value comes from the hub, and the thermo for per-thermo sensors"""
+    value_fn: Callable[[UH1, Thermostat | None], Any]
+    attrs_fn: Callable[[UH1, Thermostat | None], dict] | None = None
+    entity_category: EntityCategory | None = EntityCategory.DIAGNOSTIC
+    entity_registry_enabled_default: bool = False
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+HUB_SENSORS = (
+    HMBusSensorDescription(
+        key="cycle_time",
+        name="Poll cycle time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda uh1, _: _ms(uh1.metrics.cycle_time),
+    ),
+    HMBusSensorDescription(
+        key="utilisation",
+        name="Bus utilisation",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda uh1, _: None if uh1.metrics.utilisation is None else round(uh1.metrics.utilisation * 100, 1),
+    ),
+    HMBusSensorDescription(
+        key="timeouts",
+        name="Timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda uh1, _: sum(uh1.metrics.timeouts.values()),
+    ),
+    HMBusSensorDescription(
+        key="crc_errors",
+        name="CRC errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda uh1, _: sum(uh1.metrics.crc_errors.values()),
+    ),
+    HMBusSensorDescription(
+        key="reconnects",
+        name="Reconnects",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda uh1, _: uh1.reconnects,
+    ),
+    HMBusSensorDescription(
+        key="bytes_tx",
+        name="Bytes sent",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda uh1, _: uh1.metrics.bytes_tx,
+    ),
+    HMBusSensorDescription(
+        key="bytes_rx",
+        name="Bytes received",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda uh1, _: uh1.metrics.bytes_rx,
+    ),
+)
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return self._name
+THERMO_SENSORS = (
+    HMBusSensorDescription(
+        key="response_time",
+        name="Response time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda uh1, t: _ms(uh1.metrics.thermo_latency(t._id, OP_DCB)),
+        attrs_fn=lambda uh1, t: uh1.metrics.thermo_histograms(t._id),
+    ),
+    HMBusSensorDescription(
+        key="timeouts",
+        name="Timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda uh1, t: uh1.metrics.timeouts.get(t._id, 0),
+    ),
+)
 
-    @property
-    def unique_id(self):
-        """Return the unique ID of the binary sensor."""
-        return f"{self._sensor_prefix}_{self._entity_type}"
 
-    @property
-    def icon(self):
-        """Icon to use in the frontend, if any."""
-        return self._icon
+@dataclass(frozen=True, kw_only=True)
+class HMThermoSensorDescription(SensorEntityDescription):
+    """Thermo sensor whose value comes from the cached DCB snapshot"""
+    value_fn: Callable[[Thermostat], Any]
+
+
+STATE_SENSORS = (
+    HMThermoSensorDescription(
+        key="room_temperature",
+        name="Room temperature",
+        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+        device_class=SensorDeviceClass.TEMPERATURE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda t: t.get_room_temp(),
+    ),
+    HMThermoSensorDescription(
+        key="holiday_hours",
+        name="Holiday hours left",
+        native_unit_of_measurement=UnitOfTime.HOURS,
+        device_class=SensorDeviceClass.DURATION,
+        value_fn=lambda t: t.get_holiday_hours(),
+    ),
+    HMThermoSensorDescription(
+        key="clock_offset",
+        name="Clock offset",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda t: t.clock_drift(dt_util.now()),
+    ),
+)
 
-    @property
-    def state(self):
-        """Return the state of the sensor."""
-        try:
-            state = self.coordinator.data.sensors[self.type]
-            if state:
-                if self.type == "boiler_status":
-                    return self.boiler_status(state)
-                return state
-            return 0
-        except KeyError:
-            _LOGGER.error("can't find %s", self.type)
-            return None
 
-    @property
-    def unit_of_measurement(self):
-        """Return the unit of measurement of this entity, if any."""
-        return self._unit
+async def async_setup_entry(hass, config_entry, async_add_entities) -> None:
+    """Add the state sensors for each thermo and the bus sensors for the hub and its thermos"""
+    _LOGGER.debug("[RS] sensor.py async_setup_entry called with config_entry: {}".format(config_entry))
+    coordinator: HMCoordinator = config_entry.runtime_data.coordinator
+    sensors = [
+        HMThermoSensor(coordinator, t, d)
+        for t in coordinator.uh1.thermos
+        for d in STATE_SENSORS
+    ]
+    sensors += [HMBusSensor(coordinator, None, d) for d in HUB_SENSORS]
+    sensors += [
+        HMBusSensor(coordinator, t, d)
+        for t in coordinator.uh1.thermos
+        for d in THERMO_SENSORS
+    ]
+    async_add_entities(sensors)
+
+
+class HMThermoSensor(CoordinatorEntity, SensorEntity):
+    """One value from a thermo's snapshot, unavailable while the thermo's health check has it offline"""
+    entity_description: HMThermoSensorDescription
+
+    def __init__(self, coordinator, thermo: Thermostat, description: HMThermoSensorDescription):
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._thermo = thermo
+        self._attr_unique_id = "hmrsthermo_{}_{}".format(coordinator.thermo_key(thermo), description.key)
+        self._attr_name = "{} {}".format(thermo.name, description.name)
+        self._attr_device_info = {"identifiers": {(DOMAIN, coordinator.thermo_key(thermo))}}
+        self._attr_native_value = description.value_fn(thermo)
+        self._last_available = self.available
 
     @property
-    def device_state_attributes(self):
-        """Return the state attributes of this device."""
-        pass
+    def available(self) -> bool:
+        return super().available and self._thermo.health.available
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Only write state when the value or availability has moved"""
+        value = self.entity_description.value_fn(self._thermo)
+        available = self.available
+        if value == self._attr_native_value and available == self._last_available:
+            return
+        self._attr_native_value = value
+        self._last_available = available
+        self.async_write_ha_state()
+
+
+class HMBusSensor(CoordinatorEntity, SensorEntity):
+    """One bus metric, of the UH1 bridge or (given a thermo) of a single thermo"""
+    entity_description: HMBusSensorDescription
+    _unrecorded_attributes = frozenset({OP_DCB, OP_RANGE, OP_WRITE})     # Histograms are for looking at, not history
+
+    def __init__(self, coordinator, thermo: Thermostat | None, description: HMBusSensorDescription):
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._thermo = thermo
+        uh1 = coordinator.uh1
+        if thermo is None:
+            self._attr_unique_id = "hmrsbus_{}_{}".format(coordinator.hub_id, description.key)
+            self._attr_name = "UH1 {}".format(description.name)
+            self._attr_device_info = {"identifiers": {(DOMAIN, coordinator.hub_id)}}
+        else:
+            self._attr_unique_id = "hmrsthermo_{}_{}".format(coordinator.thermo_key(thermo), description.key)
+            self._attr_name = "{} {}".format(thermo.name, description.name)
+            self._attr_device_info = {"identifiers": {(DOMAIN, coordinator.thermo_key(thermo))}}
+        self._attr_native_value = description.value_fn(uh1, thermo)
+        self._attr_extra_state_attributes = description.attrs_fn(uh1, thermo) if description.attrs_fn else None
+        self._last_available = self.available
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Only write state when the value or availability has moved"""
+        value = self.entity_description.value_fn(self.coordinator.uh1, self._thermo)
+        attrs_fn = self.entity_description.attrs_fn
+        attrs = attrs_fn(self.coordinator.uh1, self._thermo) if attrs_fn else None
+        available = self.available
+        if value == self._attr_native_value and attrs == self._attr_extra_state_attributes and available == self._last_available:
+            return
+        self._attr_native_value = value
+        self._attr_extra_state_attributes = attrs
+        self._last_available = available
+        self.async_write_ha_state()
@@ -0,0 +1,5 @@
+"""The library and simulator are imported straight from the component directory, no Home Assistant needed"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,131 @@
+"""
+Regression tests that drive UH1 against heatmiserRS_sim in-process - discovery, full and range
+reads, a write round trip, offline thermos and resynchronising on a noisy, echoing, corrupting bus
+"""
+import asyncio
+
+import pytest
+
+import heatmiserRS as heatmiser
+import heatmiserRS_sim as sim
+
+TOPOLOGY = [(1, heatmiser.PRTHW), (2, heatmiser.PRT), (5, heatmiser.PRT)]
+
+
+@pytest.fixture(autouse=True)
+def quick_bus(monkeypatch):
+    """Static simulated rooms and clocks, so DCBs compare byte for byte, and a short worst case timeout"""
+    monkeypatch.setattr(sim, "TICK", 3600)
+    monkeypatch.setattr(heatmiser, "TIMEOUT", 0.3)
+
+
+def run(scenario, thermos=TOPOLOGY, discovered=True, **sim_args):
+    """Run scenario(simulator, uh1) with the simulator serving thermos, uh1 already knowing them if discovered"""
+    async def main():
+        simulator = sim.Simulator(thermos, seed=1, **sim_args)
+        url = await simulator.async_start()
+        topology = [{"id": i, "name": "Thermostat {}".format(i), "model": m} for i, m in thermos] if discovered else None
+        uh1 = heatmiser.UH1(url, topology)
+        try:
+            await scenario(simulator, uh1)
+        finally:
+            await uh1.async_close()
+            await simulator.async_stop()
+    asyncio.run(main())
+
+
+def test_discovery():
+    async def scenario(simulator, uh1):
+        topology = await uh1.async_discover(range(1, 9))
+        assert [(t["id"], t["model"]) for t in topology] == TOPOLOGY
+        for thermo in uh1.thermos:
+            assert thermo.dcb == bytes(simulator.thermos[thermo._id].dcb)
+        # Empty addresses are not bus timeouts
+        assert uh1.get_metrics()["timeouts"] == 0
+    run(scenario, discovered=False)
+
+
+def test_full_and_range_reads():
+    async def scenario(simulator, uh1):
+        thermo = uh1.thermos[0]
+        assert await uh1.async_read_dcb(thermo)
+        assert thermo.dcb == bytes(simulator.thermos[1].dcb)
+        assert thermo.dcb_length == len(simulator.thermos[1].dcb)
+        assert thermo.get_model() == "PRTHW"
+
+        # Warmer than target, so heat demand drops too - both are in the hot tier
+        room = simulator.thermos[1]
+        room.room_temp = 23.4
+        room.tick(0)
+        reads = room.reads
+        assert await thermo.async_read_range(*heatmiser.TIER_RANGES[heatmiser.PRTHW][heatmiser.TIER_HOT])
+        assert room.reads == reads + 1
+        assert thermo.get_room_temp() == 23.4
+        assert not thermo.get_heat_status()
+        assert thermo.dcb == bytes(room.dcb)
+    run(scenario)
+
+
+def test_write_round_trip():
+    async def scenario(simulator, uh1):
+        thermo = uh1.thermos[0]
+        assert await uh1.async_read_dcb(thermo)
+        # Two writes inside the debounce window go out together
+        target, holiday = await asyncio.gather(thermo.async_set_target_temp(25), thermo.async_set_holiday(300))
+        assert target and holiday
+        assert thermo.get_target_temp() == 25
+        assert thermo.get_holiday_hours() == 300
+        assert thermo.cold_due
+        # The thermo holds what was written and a fresh read agrees with the write-through cache
+        cached = thermo.dcb
+        assert await uh1.async_poll()
+        assert thermo.dcb == cached == bytes(simulator.thermos[1].dcb)
+    run(scenario)
+
+
+def test_offline_thermo():
+    async def scenario(simulator, uh1):
+        assert await uh1.async_poll()
+        thermo = uh1.thermos[1]
+        simulator.set_online(2, False)
+        for _ in range(heatmiser.OFFLINE_MISSES):
+            assert await uh1.async_poll()     # The others still answer
+        assert thermo.health.state == heatmiser.HEALTH_OFFLINE
+        assert not thermo.health.available
+        assert thermo.get_target_temp() is None
+        # Left out of polls until its probe is due
+        reads = simulator.thermos[2].reads
+        await uh1.async_poll()
+        assert simulator.thermos[2].reads == reads
+
+        simulator.set_online(2, True)
+        thermo.health.next_probe = 0
+        assert await uh1.async_poll()
+        assert thermo.health.state == heatmiser.HEALTH_ONLINE
+        assert thermo.dcb == bytes(simulator.thermos[2].dcb)
+    run(scenario)
+
+
+def test_unreachable_hub():
+    async def scenario(simulator, uh1):
+        uh1.conn.url = "socket://127.0.0.1:1"     # Nothing listening
+        with pytest.raises(ConnectionError):
+            await uh1.async_poll()
+    run(scenario)
+
+
+def test_resync_on_noisy_bus():
+    async def scenario(simulator, uh1):
+        answered = 0
+        for _ in range(20):
+            for thermo in uh1.thermos:
+                answered += await uh1.async_read_dcb(thermo)
+        assert simulator.noisy and simulator.corrupted
+        metrics = uh1.get_metrics()
+        assert metrics["crc_errors"] or metrics["timeouts"]
+        # A bad frame costs at most that one read, the decoder finds the next one
+        assert answered >= 20 * len(uh1.thermos) - simulator.corrupted - metrics["timeouts"]
+        for thermo in uh1.thermos:
+            assert thermo.health.available
+            assert thermo.dcb == bytes(simulator.thermos[thermo._id].dcb)
+    run(scenario, noise_rate=0.3, corrupt_rate=0.1, echo=True)